@@ -0,0 +1,418 @@
+import os
+import argparse
+import time
+
+# Suppress TensorFlow and Keras warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # FATAL
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+import cv2
+import numpy as np
+
+import config
+from modules.detection import FaceProcessor
+from modules.synthetic import SyntheticCamera, render_head
+from modules.tracker import CentroidTracker
+from modules.quality import QualityChecker
+from modules.pose import PoseEstimator
+from modules.ui import UI
+from modules.descriptor import FaceDescriptor
+from modules.motion import MotionGate
+from modules.recognition import FaceRecognizer, CascadeRecognizer
+
+
+def time_call(fn, repeats):
+    fn() # Warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats
+
+
+def make_frame(width, height, image_path=None):
+    """
+    Builds a test frame. If an image is given it is tiled over the frame,
+    otherwise textured noise is used (Haar cost depends on frame size, not content).
+    """
+    if image_path:
+        img = cv2.imread(image_path)
+        if img is None:
+            raise SystemExit(f"Could not read {image_path}")
+        reps_y = height // img.shape[0] + 1
+        reps_x = width // img.shape[1] + 1
+        return np.tile(img, (reps_y, reps_x, 1))[:height, :width].copy()
+
+    rng = np.random.default_rng(0)
+    noise = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    return cv2.resize(noise, (width, height), interpolation=cv2.INTER_LINEAR)
+
+
+def bench_detection(args):
+    frame = make_frame(args.width, args.height, args.image)
+    cols, rows = args.tiles
+    max_face = args.max_face or config.DETECTION_MAX_FACE_PX or 200 # Tiling needs a bound
+
+    print(f"Frame {args.width}x{args.height}, tiles {cols}x{rows}, max face {max_face} px, {args.repeats} runs")
+
+    # Baseline is the untiled path as main.py runs it, with OpenCV's own threading
+    single = FaceProcessor(min_face=config.DETECTION_MIN_FACE_PX, max_face=max_face)
+    base = time_call(lambda: single.process(frame), args.repeats)
+    print(f"  untiled ({cv2.getNumThreads()} cv thr): {base * 1000:8.1f} ms  ({len(single.process(frame))} faces)")
+
+    counts = sorted({1, 2, 4, 8, os.cpu_count() or 1})
+    for threads in [t for t in counts if t <= (args.max_threads or os.cpu_count() or 1)]:
+        tiled = FaceProcessor(
+            tiles=(cols, rows), threads=threads,
+            min_face=config.DETECTION_MIN_FACE_PX, max_face=max_face
+        )
+        t = time_call(lambda: tiled.process(frame), args.repeats)
+        print(f"  tiled {threads:2d} thr ({cv2.getNumThreads()} cv): {t * 1000:8.1f} ms  speedup x{base / t:.2f}  "
+              f"({len(tiled.process(frame))} faces, {tiled.scanned_area(args.width, args.height):.2f}x area)")
+        tiled.close()
+
+
+def bench_pipeline(args):
+    """
+    Per-stage cost against crowd size on a deterministic synthetic crowd.
+    With --ground-truth the synthetic boxes replace Haar detection, which
+    isolates the tracker / quality / drawing cost at high face counts.
+    """
+    detector = FaceProcessor(min_face=config.DETECTION_MIN_FACE_PX, max_face=config.DETECTION_MAX_FACE_PX)
+    quality_checker = QualityChecker(
+        blur_threshold=config.BLUR_THRESHOLD,
+        min_brightness=config.MIN_BRIGHTNESS,
+        max_brightness=config.MAX_BRIGHTNESS,
+        min_face_width=config.MIN_FACE_WIDTH_PX,
+        gate_proxy_pose=config.POSE_PROXY_GATE
+    )
+    ui = UI()
+
+    print(f"{'faces':>6} {'detect':>9} {'track':>9} {'quality':>9} {'draw':>9} {'total':>9}  (ms/frame)")
+    for num_faces in args.faces:
+        cam = SyntheticCamera(
+            num_faces=num_faces, width=args.width, height=args.height,
+            faces_dir=args.faces_dir, face_size=(40, 80) if num_faces > 50 else (80, 160),
+            occlusion=args.occlusion, lighting=args.lighting, seed=args.seed
+        ).start()
+        tracker = CentroidTracker(max_disappeared=30)
+        totals = np.zeros(4)
+
+        for _ in range(args.frames):
+            frame = cam.read()
+
+            t0 = time.perf_counter()
+            if args.ground_truth:
+                faces_data = [{"bbox": b, "landmarks": None} for b in cam.ground_truth()]
+            else:
+                faces_data = detector.process(frame)
+            t1 = time.perf_counter()
+            tracker.update([f["bbox"] for f in faces_data])
+            tracker.pop_deregistered()
+            t2 = time.perf_counter()
+            quality_checker.estimate_poses(frame, faces_data)
+            for face in faces_data:
+                quality_checker.evaluate(frame, face)
+            t3 = time.perf_counter()
+            for face in faces_data:
+                ui.draw_box(frame, face["bbox"], "red", label="ID")
+            ui.draw_dashboard(frame, {"Faces": len(faces_data)})
+            t4 = time.perf_counter()
+
+            totals += (t1 - t0, t2 - t1, t3 - t2, t4 - t3)
+
+        cam.stop()
+        ms = totals / args.frames * 1000
+        print(f"{num_faces:>6} {ms[0]:9.2f} {ms[1]:9.2f} {ms[2]:9.2f} {ms[3]:9.2f} {ms.sum():9.2f}")
+
+
+def bench_idle(args):
+    """
+    CPU per frame on an empty static scene with and without the motion gate,
+    then the latency until faces are detected once people walk in.
+    """
+    detector = FaceProcessor(min_face=config.DETECTION_MIN_FACE_PX, max_face=config.DETECTION_MAX_FACE_PX)
+    empty = SyntheticCamera(num_faces=0, width=args.width, height=args.height, seed=args.seed).start()
+    crowd = SyntheticCamera(num_faces=3, width=args.width, height=args.height, seed=args.seed).start()
+    frame = empty.read()
+
+    start = time.process_time()
+    for _ in range(args.frames):
+        detector.process(frame)
+    ungated = (time.process_time() - start) / args.frames
+
+    gate = MotionGate(
+        min_fraction=config.MOTION_MIN_FRACTION,
+        idle_after=config.MOTION_IDLE_AFTER_FRAMES,
+        idle_detect_interval=config.MOTION_IDLE_DETECT_INTERVAL
+    )
+    for i in range(config.MOTION_IDLE_AFTER_FRAMES + 1): # Settle into idle
+        gate.should_detect(gate.update(frame), 0, i)
+    start = time.process_time()
+    for i in range(args.frames):
+        if gate.should_detect(gate.update(frame), 0, i):
+            detector.process(frame)
+    gated = (time.process_time() - start) / args.frames
+
+    # Wake-up: the first crowd frame, giving up after --wake-frames
+    frame = crowd.read()
+    t0 = time.perf_counter()
+    frames_to_detect = None
+    for i in range(args.wake_frames):
+        if gate.should_detect(gate.update(frame), 0, args.frames + i) and detector.process(frame):
+            frames_to_detect = i
+            break
+        frame = crowd.read()
+    latency = time.perf_counter() - t0
+
+    print(f"Empty scene {args.width}x{args.height}, {args.frames} frames")
+    print(f"  always detect : {ungated * 1000:8.2f} ms CPU/frame")
+    print(f"  motion gated  : {gated * 1000:8.2f} ms CPU/frame  ({ungated / max(gated, 1e-9):.0f}x less)")
+    if frames_to_detect is None:
+        print(f"  wake-up       : no face detected within {args.wake_frames} frames (miss)")
+    else:
+        print(f"  wake-up       : {frames_to_detect} extra frames, {latency * 1000:.1f} ms to first detection")
+
+
+def rendered_poses(detector, yaws, pitches, ramp=0.0, seed=0):
+    """
+    Every synthetic face rendered at every (yaw, pitch) on a 320x320 frame,
+    optionally under a lighting ramp from 1 - ramp to 1 + ramp across the head.
+    Returns [(yaw, pitch, frame, bbox)] for the renders Haar detects.
+    """
+    cam = SyntheticCamera(num_faces=0, width=320, height=320, seed=seed)
+    # The head spans x = 80..240
+    gain = np.clip(1 + ramp * (np.arange(320) - 160) / 80, 0.1, None)[None, :, None]
+    samples = []
+    for patch in cam.patches:
+        for yaw in yaws:
+            for pitch in pitches:
+                img, mask = render_head(patch, pitch, yaw)
+                frame = cam.background.copy()
+                frame[80:240, 80:240][mask] = img[mask]
+                if ramp:
+                    frame = np.clip(frame * gain, 0, 255).astype(np.uint8)
+                faces = detector.process(frame)
+                if faces:
+                    bbox = max((f["bbox"] for f in faces), key=lambda b: (b[2] - b[0]) * (b[3] - b[1]))
+                    samples.append((yaw, pitch, frame, bbox))
+    return samples
+
+
+def bench_pose(args):
+    """
+    Fits the pose proxy gains on rendered heads at known angles, then
+    checks the configured PoseEstimator and the MAX_YAW / MAX_PITCH gate,
+    also under side lighting.
+    """
+    detector = FaceProcessor()
+    yaws, pitches = range(-45, 46, 5), range(-30, 31, 10)
+    samples = rendered_poses(detector, yaws, pitches, seed=args.seed)
+    total = len(yaws) * len(pitches) * 8
+    print(f"{len(samples)}/{total} renders detected by Haar")
+
+    # Raw proxy signals: unit gains, centre 0 -> (-centroid, left/right imbalance)
+    raw = PoseEstimator(yaw_gain=1.0, pitch_gain=1.0, pitch_centre=0.0)
+    signals = np.array([raw.proxy(frame, [bbox])[0] for _, _, frame, bbox in samples])
+    angles = np.array([(pitch, yaw) for yaw, pitch, _, _ in samples], dtype=np.float64)
+    yaw_gain = float(signals[:, 1] @ angles[:, 1] / (signals[:, 1] @ signals[:, 1]))
+    # pitch = gain * (centre - centroid) = gain * signal + gain * centre
+    slope, offset = np.polyfit(signals[:, 0], angles[:, 0], 1)
+    print(f"  fitted: yaw_gain {yaw_gain:.1f}, pitch_gain {slope:.1f}, pitch_centre {offset / slope:.3f}")
+
+    estimator = PoseEstimator()
+    max_yaw, max_pitch = config.MAX_YAW_ANGLE, config.MAX_PITCH_ANGLE
+    for name, ramp in (("even light", 0.0), ("side light", 0.5)):
+        if ramp:
+            samples = rendered_poses(detector, yaws, pitches, ramp, args.seed)
+            angles = np.array([(pitch, yaw) for yaw, pitch, _, _ in samples], dtype=np.float64)
+        poses = np.array([estimator.proxy(frame, [bbox])[0] for _, _, frame, bbox in samples])
+        err = poses - angles
+        passed = (np.abs(poses[:, 0]) <= max_pitch) & (np.abs(poses[:, 1]) <= max_yaw)
+        frontal = (np.abs(angles[:, 0]) <= 10) & (np.abs(angles[:, 1]) <= 10)
+        turned = np.abs(angles[:, 1]) >= max_yaw + 10
+        print(f"  {name}: RMS error yaw {np.sqrt(np.mean(err[:, 1] ** 2)):.1f}, pitch {np.sqrt(np.mean(err[:, 0] ** 2)):.1f} deg, "
+              f"frontal yaw bias {np.mean(err[frontal, 1]):+.1f}; gate passes {passed[frontal].mean():.0%} of faces "
+              f"within 10 deg, {passed[turned].mean():.0%} of faces turned {max_yaw + 10}+ deg")
+
+
+def largest_face(detector, img):
+    """Largest Haar box in the image, or the whole image if none is found."""
+    faces = detector.process(img)
+    if not faces:
+        return (0, 0, img.shape[1], img.shape[0])
+    return max((f["bbox"] for f in faces), key=lambda b: (b[2] - b[0]) * (b[3] - b[1]))
+
+
+def load_dataset(path):
+    """
+    Labelled dataset laid out as <path>/<person>/<image>.
+    Returns {person: [(image, bbox), ...]} with bbox the largest Haar face.
+    """
+    detector = FaceProcessor()
+    dataset = {}
+    for person in sorted(os.listdir(path)):
+        folder = os.path.join(path, person)
+        if not os.path.isdir(folder):
+            continue
+        images = []
+        for name in sorted(os.listdir(folder)):
+            img = cv2.imread(os.path.join(folder, name))
+            if img is not None:
+                images.append((img, largest_face(detector, img)))
+        if images:
+            dataset[person] = images
+    return dataset
+
+
+def synthetic_dataset(per_person=8, seed=0):
+    """
+    The procedural faces of SyntheticCamera pasted on its background at
+    random sizes, positions and brightness, one "person" per face.
+    Only good for calibrating the LBP stage, DeepFace sees no real faces here.
+    """
+    cam = SyntheticCamera(num_faces=0, width=320, height=320, seed=seed)
+    rng = np.random.default_rng(seed)
+    detector = FaceProcessor()
+    dataset = {}
+    for i, patch in enumerate(cam.patches):
+        images = []
+        for _ in range(per_person):
+            size = int(rng.integers(100, 161))
+            x, y = (int(v) for v in rng.integers(0, 320 - size, 2))
+            img = cam.background.copy()
+            img[y:y + size, x:x + size] = cv2.resize(patch, (size, size))
+            img = cv2.convertScaleAbs(img, alpha=rng.uniform(0.8, 1.2))
+            images.append((img, largest_face(detector, img)))
+        dataset[f"synthetic_{i}"] = images
+    return dataset
+
+
+def jitter_box(rng, bbox, amount):
+    """Shifts a box by up to `amount` of its width, like frame-to-frame Haar jitter."""
+    if not amount:
+        return bbox
+    x1, y1, x2, y2 = bbox
+    dx, dy = (int(v) for v in rng.uniform(-amount, amount, 2) * (x2 - x1))
+    return (x1 + dx, y1 + dy, x2 + dx, y2 + dy)
+
+
+def bench_cascade(args):
+    """
+    LBP distances, accuracy and deep inferences avoided by the cascade.
+    The first image of each person is enrolled, the rest are probes with
+    their box jittered by --jitter. Every Nth person is left out of the
+    gallery to test impostor rejection. The LBP part runs without DeepFace
+    and suggests a CASCADE_REJECT_DISTANCE that keeps enrolled people.
+    """
+    dataset = load_dataset(args.dataset) if args.dataset else synthetic_dataset(seed=args.seed)
+    rng = np.random.default_rng(args.seed)
+    recognizer = FaceRecognizer(config.MATCH_THRESHOLD)
+    cascade = CascadeRecognizer(recognizer, FaceDescriptor(), args.shortlist, args.reject_distance)
+
+    ids, names, descriptors, enrolled_images = [], [], [], []
+    probes = []
+    for i, (person, images) in enumerate(dataset.items()):
+        enrolled = args.impostor_every == 0 or i % args.impostor_every != args.impostor_every - 1
+        if enrolled:
+            img, bbox = images[0]
+            ids.append(person)
+            names.append(person)
+            descriptors.append(cascade.descriptor.compute(img, bbox))
+            enrolled_images.append((img, bbox))
+            images = images[1:]
+        for img, bbox in images:
+            probes.append((person if enrolled else "Unknown", img, jitter_box(rng, bbox, args.jitter)))
+
+    # LBP only: distance of each probe to its own template and to everyone else's
+    genuine, impostor = [], []
+    gallery = np.stack(descriptors)
+    for expected, img, bbox in probes:
+        dists = cascade.descriptor.distances(cascade.descriptor.compute(img, bbox), gallery)
+        for person, dist in zip(ids, dists):
+            (genuine if person == expected else impostor).append(dist)
+    print(f"{len(ids)} enrolled, {len(probes)} probes, box jitter up to {args.jitter:.0%} of the width")
+    if genuine:
+        print(f"  LBP genuine  : p50 {np.percentile(genuine, 50):.2f}  p99 {np.percentile(genuine, 99):.2f}  max {max(genuine):.2f}")
+    print(f"  LBP impostor : min {min(impostor):.2f}  p50 {np.percentile(impostor, 50):.2f}")
+    if genuine:
+        rejected = np.mean(np.array(genuine) > args.reject_distance) if args.reject_distance is not None else 0.0
+        print(f"  reject distance {args.reject_distance}: {rejected:.1%} of genuine probes rejected "
+              f"(keeping all needs > {max(genuine):.2f})")
+
+    embeddings = []
+    for img, bbox in enrolled_images:
+        emb = recognizer.encode(img, bbox)
+        if emb is None:
+            print("Deep encoding unavailable (is DeepFace installed?), skipping accuracy.")
+            return
+        embeddings.append(emb)
+
+    baseline_ok = cascade_ok = 0
+    for expected, img, bbox in probes:
+        emb = recognizer.encode(img, bbox)
+        _, name, _, _ = recognizer.identify(emb, embeddings, ids, names)
+        baseline_ok += name == expected
+
+        result = cascade.recognize(img, bbox, embeddings, ids, names, descriptors)
+        name = result[1] if result is not None else "Unknown"
+        cascade_ok += name == expected
+
+    n = max(len(probes), 1)
+    print(f"  baseline accuracy : {baseline_ok / n:.1%}")
+    print(f"  cascade accuracy  : {cascade_ok / n:.1%}  ({(cascade_ok - baseline_ok) / n:+.1%})")
+    print(f"  deep inferences avoided: {cascade.avoided_fraction:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Face Authentication System benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    det = sub.add_parser("detection", help="Tiled Haar detection speedup vs thread count")
+    det.add_argument("--width", type=int, default=3840)
+    det.add_argument("--height", type=int, default=2160)
+    det.add_argument("--tiles", type=int, nargs=2, default=[3, 2], metavar=("COLS", "ROWS"))
+    det.add_argument("--image", help="Optional image tiled over the frame")
+    det.add_argument("--repeats", type=int, default=5)
+    det.add_argument("--max-threads", type=int, default=None)
+    det.add_argument("--max-face", type=int, default=None, help="Largest face in px (default DETECTION_MAX_FACE_PX, or 200)")
+    det.set_defaults(func=bench_detection)
+
+    pipe = sub.add_parser("pipeline", help="Per-stage cost vs number of faces (synthetic crowd)")
+    pipe.add_argument("--faces", type=int, nargs="+", default=[1, 10, 50, 100, 200])
+    pipe.add_argument("--frames", type=int, default=30)
+    pipe.add_argument("--width", type=int, default=config.FRAME_WIDTH)
+    pipe.add_argument("--height", type=int, default=config.FRAME_HEIGHT)
+    pipe.add_argument("--faces-dir", default=None, help="Folder of face images to sample from")
+    pipe.add_argument("--occlusion", type=float, default=0.0)
+    pipe.add_argument("--lighting", type=float, default=0.0)
+    pipe.add_argument("--seed", type=int, default=0)
+    pipe.add_argument("--ground-truth", action="store_true", help="Skip Haar, use synthetic boxes")
+    pipe.set_defaults(func=bench_pipeline)
+
+    idle = sub.add_parser("idle", help="Motion gate CPU savings and wake-up latency")
+    idle.add_argument("--frames", type=int, default=60)
+    idle.add_argument("--width", type=int, default=config.FRAME_WIDTH)
+    idle.add_argument("--height", type=int, default=config.FRAME_HEIGHT)
+    idle.add_argument("--seed", type=int, default=0)
+    idle.add_argument("--wake-frames", type=int, default=30, help="Crowd frames to wait for a detection")
+    idle.set_defaults(func=bench_idle)
+
+    pose = sub.add_parser("pose", help="Calibrate the head-pose proxy on rendered heads")
+    pose.add_argument("--seed", type=int, default=0)
+    pose.set_defaults(func=bench_pose)
+
+    cas = sub.add_parser("cascade", help="LBP cascade accuracy and deep inferences avoided")
+    cas.add_argument("dataset", nargs="?", default=None, help="Folder laid out as <person>/<image> (default: synthetic faces)")
+    cas.add_argument("--shortlist", type=int, default=config.CASCADE_SHORTLIST)
+    cas.add_argument("--reject-distance", type=float, default=config.CASCADE_REJECT_DISTANCE)
+    cas.add_argument("--impostor-every", type=int, default=5, help="Leave every Nth person out of the gallery (0 = none)")
+    cas.add_argument("--jitter", type=float, default=0.1, help="Max probe box shift as a fraction of its width")
+    cas.add_argument("--seed", type=int, default=0)
+    cas.set_defaults(func=bench_cascade)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,14 +12,46 @@ FRAME_WIDTH = 1280
 FRAME_HEIGHT = 720
 FPS = 30
 
+# Quality of Service (holds FPS by degrading detection / analysis, see modules/qos.py)
+QOS_ENABLED = True
+QOS_DEGRADE_FRAMES = 5 # Consecutive slow frames before stepping down a level
+QOS_UPGRADE_FRAMES = 45 # Consecutive fast frames before stepping back up
+
+# Track State Store (see modules/track_store.py)
+MAX_TRACKS = 256 # Least recently seen unverified tracks are evicted beyond this
+TRACK_MEMORY_MB = 64 # Ceiling for the track embedding pool (float32)
+
+# Re-identification (verified tracks lost by the tracker keep their identity, see modules/reid.py)
+REID_TTL = 10.0 # seconds a lost verified track is remembered
+REID_WINDOW_PX = 200 # max centre shift between where it was lost and where it reappears
+REID_MAX_DISTANCE = 1.05 # LBP pre-filter only (same calibration as CASCADE_REJECT_DISTANCE);
+# LBP can't tell people apart, a candidate is confirmed by a 1:1 embedding check at VERIFY_THRESHOLD
+
+# Motion Gate (idle mode when nobody is present, see modules/motion.py)
+MOTION_GATE_ENABLED = True
+MOTION_MIN_FRACTION = 0.005 # Fraction of thumbnail pixels that must change to count as motion
+MOTION_IDLE_AFTER_FRAMES = 30 # Static frames with no tracks before going idle
+MOTION_IDLE_DETECT_INTERVAL = 15 # While idle, still detect every N frames (0 = never)
+
 # Face Detection
 MIN_DETECTION_CONFIDENCE = 0.7
 MIN_TRACKING_CONFIDENCE = 0.7
+DETECTION_MIN_FACE_PX = 50
+DETECTION_MAX_FACE_PX = None # None = no cap (untiled only; tiled mode needs a cap, it sets the tile overlap)
+
+# Tiled Detection (for 1080p / 4K frames)
+DETECTION_TILES = (1, 1) # (cols, rows), (1, 1) = single detectMultiScale call; tiling needs DETECTION_MAX_FACE_PX
+DETECTION_THREADS = os.cpu_count() or 1 # OpenCV's own threads are cut to cores // this while tiling
+DETECTION_NMS_OVERLAP = 0.3 # Boxes overlapping more than this at tile seams are merged
+# Optional expected face size per tile row, top to bottom: [(min_px, max_px), ...]
+# Faces far from the camera (top of a wide entrance shot) are smaller.
+DETECTION_ROW_FACE_SIZES = None
 
 # Quality Control Thresholds
 MIN_FACE_WIDTH_PX = 80
 MAX_YAW_ANGLE = 25  # degrees
 MAX_PITCH_ANGLE = 25 # degrees
+POSE_PROXY_GATE = True # Also reject on the Haar-only pose proxy (calibrated with benchmark.py pose, ~7 deg RMS)
 BLUR_THRESHOLD = 50 # Laplacian variance (higher is clearer)
 MIN_BRIGHTNESS = 70 # 0-255
 MAX_BRIGHTNESS = 220
@@ -31,9 +63,53 @@ BLINK_CONSEC_FRAMES = 2 # Number of frames to confirm blink
 MAR_THRESHOLD = 0.5 # Above this is open mouth
 HEAD_TURN_THRESHOLD = 20 # degrees
 
+# Liveness (Passive, checked before the active challenge, see PassiveLivenessDetector)
+PASSIVE_LIVENESS_ENABLED = False # Off until the thresholds are calibrated against real spoofs
+PASSIVE_WINDOW = 15 # frames of ROI statistics before deciding
+PASSIVE_MOTION_MIN = 0.02 # non-rigid micro-motion of the face thumbnail
+PASSIVE_TEXTURE_MIN = 0.15 # fine detail relative to contrast (prints/screens are flatter)
+PASSIVE_JITTER_MIN = 0.004 # box centre spread relative to face width
+
 # Recognition
 MATCH_THRESHOLD = 0.5 # Lower is stricter (Euclidean distance)
+VERIFY_THRESHOLD = 0.4 # 1:1 verification against a claimed identity (cosine distance)
+
+# Embedding Cache (deep model outputs keyed by face-crop content, see modules/embedding_cache.py)
+EMBEDDING_CACHE_ENABLED = True
+EMBEDDING_CACHE_SIZE = 1024 # entries kept in memory (LRU)
+EMBEDDING_CACHE_TTL = 300 # seconds
+EMBEDDING_CACHE_DIR = None # e.g. "database/cache" to keep entries across restarts
+
+# Sharded Search (1:N across worker processes, see modules/sharding.py)
+SEARCH_SHARDS = 0 # 0 = search in-process (with the cascade pre-filter)
+SEARCH_SHARD_DIR = "database/shards"
+SEARCH_TIMEOUT = 0.05 # seconds before a slow shard is skipped for a query
+SEARCH_MAX_INCOMPLETE = 5 # Searches in a row missing a shard before falling back to the in-process gallery
+
+# Cascade Recognition (cheap LBP pre-filter before VGG-Face, see modules/descriptor.py)
+CASCADE_SHORTLIST = 5 # Deep-compare only the N closest users by LBP (None = all)
+CASCADE_REJECT_DISTANCE = 1.05 # LBP Hellinger distance (0-1.41) above which a face is rejected without deep inference (None = never)
+# (benchmark.py cascade: genuine probes reach 1.02 with boxes jittered by 20% of their width)
+CASCADE_REJECT_FRAMES = 3 # Consecutive LBP rejects before a track is denied (one jittery box is not enough)
 
 # Paths
 DB_PATH = "database/users.json"
 LOG_PATH = "auth.log"
+
+# Crop Archive (enrollment crops, re-embedded by migrate.py on a model change, see modules/archive.py)
+ARCHIVE_DIR = "database/crops"
+ARCHIVE_CHUNK_SIZE = 64 # crops per compressed chunk
+
+# Session Recording (--record / --replay, see modules/recording.py)
+RECORD_CHUNK_FRAMES = 150 # frames per chunk file
+RECORD_CODEC = ".jpg" # ".png" for bit-exact (lossless, several times slower to encode)
+
+# Latency Tracing (per-track stage timings, see modules/tracing.py)
+TRACE_MAX_TRACES = 1000 # Completed traces kept in memory
+
+# Audit Log (written by a background thread, see modules/audit.py)
+AUDIT_QUEUE_SIZE = 10000 # Events beyond this are dropped instead of blocking the frame loop
+AUDIT_BATCH_SIZE = 256
+AUDIT_FSYNC_INTERVAL = 5.0 # seconds
+AUDIT_MAX_BYTES = 10 * 1024 * 1024 # Rotate after 10 MB
+AUDIT_ROTATE_INTERVAL = 24 * 3600 # or after a day
@@ -1,4 +1,5 @@
 import os
+import sys
 import logging
 
 # Suppress TensorFlow and Keras warnings
@@ -10,6 +11,7 @@ import cv2
 import time
 import numpy as np
 import threading
+import argparse
 from collections import deque
 
 # Config
@@ -17,22 +19,147 @@ import config
 
 # Modules
 from modules.camera import Camera
+from modules.synthetic import SyntheticCamera
+from modules.recording import SessionRecorder, ReplayCamera
 from modules.detection import FaceProcessor
 from modules.tracker import CentroidTracker
 from modules.quality import QualityChecker
-from modules.liveness import LivenessDetector
-from modules.recognition import FaceRecognizer
+from modules.liveness import LivenessDetector, PassiveLivenessDetector
+from modules.recognition import FaceRecognizer, CascadeRecognizer, load_deepface
+from modules.descriptor import FaceDescriptor
 from modules.analysis import FaceAnalyzer
+from modules.embedding_cache import EmbeddingCache
+from modules.preprocess import FacePreprocessor
 from modules.database import Database
+from modules.archive import CropArchive
+from modules.audit import AuditLog
+from modules.qos import QoSController
+from modules.track_store import TrackStateStore
+from modules.reid import ReIDCache
+from modules.motion import MotionGate
+from modules.tracing import AuthTracer
+from modules.sharding import ShardedGallery
 from modules.ui import UI
 from modules.geometry import calculate_distance
 
-def main():
+def parse_args():
+    parser = argparse.ArgumentParser(description="Face Authentication System")
+    parser.add_argument("--headless", action="store_true", help="Run without a preview window")
+    parser.add_argument("--frames", type=int, default=0, help="Stop after N frames (0 = run forever)")
+    parser.add_argument("--synthetic", type=int, default=None, metavar="N",
+                        help="Use a synthetic crowd of N faces instead of the webcam")
+    parser.add_argument("--faces-dir", default=None, help="Folder of face images for the synthetic crowd")
+    parser.add_argument("--speed", type=float, default=4.0, help="Synthetic face speed (px/frame)")
+    parser.add_argument("--occlusion", type=float, default=0.0, help="Fraction of synthetic faces occluded")
+    parser.add_argument("--lighting", type=float, default=0.0, help="Synthetic lighting variation (0-1)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--trace", default=None, metavar="PATH",
+                        help="Write per-track latency traces (Chrome trace JSON) on exit")
+    parser.add_argument("--record", default=None, metavar="DIR",
+                        help="Record the input frames with their capture timestamps to DIR")
+    parser.add_argument("--replay", default=None, metavar="DIR",
+                        help="Play back a recorded session instead of the webcam")
+    parser.add_argument("--replay-mode", default="realtime", choices=["realtime", "fast", "step"],
+                        help="Recorded pacing, as fast as possible, or one frame per 'n' key / Enter")
+    parser.add_argument("--claim", default=None, metavar="USER",
+                        help="1:1 verify every face against this user ID or name (e.g. from a badge reader)")
+    return parser.parse_args()
+
+def open_source(args):
+    if args.replay:
+        return ReplayCamera(args.replay, mode=args.replay_mode).start()
+    if args.synthetic is not None:
+        return SyntheticCamera(
+            num_faces=args.synthetic,
+            width=config.FRAME_WIDTH,
+            height=config.FRAME_HEIGHT,
+            faces_dir=args.faces_dir,
+            speed=args.speed,
+            occlusion=args.occlusion,
+            lighting=args.lighting,
+            seed=args.seed
+        ).start()
+    return Camera(config.CAMERA_ID, config.FRAME_WIDTH, config.FRAME_HEIGHT).start()
+
+def step_from_stdin(cam):
+    # Headless step mode: every Enter advances the replay by one frame
+    def reader():
+        for _ in sys.stdin:
+            cam.step()
+    threading.Thread(target=reader, daemon=True).start()
+
+def verify_claim(recognizer, descriptor, db, claim_ids, frame, bbox, spans=None):
+    """
+    1:1 fast path: compare only against the claimed user's templates.
+    Same return shape as CascadeRecognizer.recognize; the LBP descriptor
+    is still computed so the track can be re-identified later.
+    """
+    if spans is not None:
+        spans["encode_start"] = time.time()
+    emb = recognizer.encode(frame, bbox)
+    if spans is not None:
+        spans["encode_end"] = time.time()
+    if emb is None:
+        return None
+    # Closest claimed user; a rejected claim still reports its real distance
+    best = (None, "Unknown", float('inf'), 0.0)
+    for user_id in claim_ids:
+        match, dist, conf = recognizer.verify(emb, user_id, config.VERIFY_THRESHOLD)
+        if dist < best[2]:
+            best = (user_id, db.users[user_id]['name'], dist, conf) if match else (None, "Unknown", dist, 0.0)
+    return best + (emb, descriptor.compute(frame, bbox))
+
+def search_sharded(recognizer, descriptor, gallery, fallback, frame, bbox, spans=None):
+    """
+    1:N search scattered across the gallery shards.
+    Same return shape as CascadeRecognizer.recognize (descriptor for re-ID).
+    fallback is the in-process gallery (embeddings, ids, names), searched
+    once the shards have missed SEARCH_MAX_INCOMPLETE queries in a row.
+    """
+    if spans is not None:
+        spans["encode_start"] = time.time()
+    emb = recognizer.encode(frame, bbox)
+    if spans is not None:
+        spans["encode_end"] = time.time()
+    if emb is None:
+        return None
+    match = gallery.identify(emb)
+    if match is None:
+        if gallery.incomplete < config.SEARCH_MAX_INCOMPLETE:
+            return None # A shard missed the deadline: retry on a later frame
+        # Shards keep failing (respawning, overloaded): decide in-process with this embedding
+        match = recognizer.identify(emb, *fallback)
+    return match + (emb, descriptor.compute(frame, bbox))
+
+def main(args=None):
+    if args is None:
+        args = parse_args()
     print("Initializing System...")
+    load_deepface() # Up front, not on the first recognition (and only in this process)
     
     # 1. Initialize Modules
-    cam = Camera(config.CAMERA_ID, config.FRAME_WIDTH, config.FRAME_HEIGHT).start()
-    detector = FaceProcessor(config.MIN_DETECTION_CONFIDENCE, config.MIN_TRACKING_CONFIDENCE)
+    cam = open_source(args)
+    recorder = None
+    if args.record:
+        recorder = SessionRecorder(
+            args.record,
+            chunk_frames=config.RECORD_CHUNK_FRAMES,
+            codec=config.RECORD_CODEC
+        ).start()
+    if args.replay:
+        print(f"Replaying {len(cam)} frames from {args.replay} ({args.replay_mode}).")
+        if args.replay_mode == "step" and args.headless:
+            step_from_stdin(cam)
+    detector = FaceProcessor(
+        config.MIN_DETECTION_CONFIDENCE,
+        config.MIN_TRACKING_CONFIDENCE,
+        tiles=config.DETECTION_TILES,
+        threads=config.DETECTION_THREADS,
+        min_face=config.DETECTION_MIN_FACE_PX,
+        max_face=config.DETECTION_MAX_FACE_PX,
+        row_face_sizes=config.DETECTION_ROW_FACE_SIZES,
+        nms_overlap=config.DETECTION_NMS_OVERLAP
+    )
     tracker = CentroidTracker(max_disappeared=30)
     quality_checker = QualityChecker(
         blur_threshold=config.BLUR_THRESHOLD,
@@ -40,7 +167,8 @@ def main():
         max_brightness=config.MAX_BRIGHTNESS,
         max_yaw=config.MAX_YAW_ANGLE,
         max_pitch=config.MAX_PITCH_ANGLE,
-        min_face_width=config.MIN_FACE_WIDTH_PX
+        min_face_width=config.MIN_FACE_WIDTH_PX,
+        gate_proxy_pose=config.POSE_PROXY_GATE
     )
     liveness_detector = LivenessDetector(
         ear_thresh=config.EAR_THRESHOLD,
@@ -48,26 +176,101 @@ def main():
         head_turn_thresh=config.HEAD_TURN_THRESHOLD,
         blink_consec_frames=config.BLINK_CONSEC_FRAMES
     )
-    recognizer = FaceRecognizer(config.MATCH_THRESHOLD)
-    analyzer = FaceAnalyzer()
     db = Database(config.DB_PATH)
+    # Same crop content -> same embedding / attributes, shared by both models
+    embedding_cache = EmbeddingCache(
+        max_entries=config.EMBEDDING_CACHE_SIZE,
+        ttl=config.EMBEDDING_CACHE_TTL,
+        disk_dir=config.EMBEDDING_CACHE_DIR
+    ) if config.EMBEDDING_CACHE_ENABLED else None
+    # One crop + resize per face and frame, shared by recognition and analysis
+    preprocessor = FacePreprocessor(max_faces=config.MAX_TRACKS)
+    # Live embedding column decides the model (switched by migrate.py --switch)
+    recognizer = FaceRecognizer(config.MATCH_THRESHOLD, model_name=db.active_model(),
+                                cache=embedding_cache, preprocessor=preprocessor, db=db)
+    archive = CropArchive(config.ARCHIVE_DIR, chunk_size=config.ARCHIVE_CHUNK_SIZE)
+    cascade = CascadeRecognizer(
+        recognizer,
+        FaceDescriptor(),
+        shortlist_size=config.CASCADE_SHORTLIST,
+        reject_distance=config.CASCADE_REJECT_DISTANCE
+    )
+    analyzer = FaceAnalyzer(cache=embedding_cache, preprocessor=preprocessor)
+    reid = ReIDCache(
+        cascade.descriptor,
+        ttl=config.REID_TTL,
+        window_px=config.REID_WINDOW_PX,
+        max_distance=config.REID_MAX_DISTANCE
+    )
+    gate = MotionGate(
+        min_fraction=config.MOTION_MIN_FRACTION,
+        idle_after=config.MOTION_IDLE_AFTER_FRAMES,
+        idle_detect_interval=config.MOTION_IDLE_DETECT_INTERVAL
+    ) if config.MOTION_GATE_ENABLED else None
     ui = UI()
+    audit = AuditLog(
+        config.LOG_PATH,
+        queue_size=config.AUDIT_QUEUE_SIZE,
+        batch_size=config.AUDIT_BATCH_SIZE,
+        fsync_interval=config.AUDIT_FSYNC_INTERVAL,
+        max_bytes=config.AUDIT_MAX_BYTES,
+        rotate_interval=config.AUDIT_ROTATE_INTERVAL
+    ).start()
+    qos = QoSController(
+        target_fps=config.FPS,
+        enabled=config.QOS_ENABLED,
+        degrade_frames=config.QOS_DEGRADE_FRAMES,
+        upgrade_frames=config.QOS_UPGRADE_FRAMES
+    )
 
     # Load known faces
     known_ids, known_names, known_embeddings = db.get_all_embeddings()
+    known_descriptors = db.get_all_descriptors()
     print(f"Loaded {len(known_ids)} users from database.")
 
-    # State Management for Tracked IDs
-    # format: { track_id: { 'name': str, 'verified': bool, 'liveness_status': str, 'attributes': {}, 'challenge': str, 'start_time': float } }
-    track_states = {}
+    # Large galleries: partition across worker processes
+    gallery = None
+    if config.SEARCH_SHARDS > 0:
+        gallery = ShardedGallery(
+            config.SEARCH_SHARD_DIR,
+            num_shards=config.SEARCH_SHARDS,
+            timeout=config.SEARCH_TIMEOUT,
+            match_threshold=config.MATCH_THRESHOLD
+        ).start(known_ids, known_names, known_embeddings)
+        print(f"Gallery split across {config.SEARCH_SHARDS} search shards.")
+
+    # 1:1 verification against a claimed identity; 1:N search otherwise
+    claim_ids = []
+    if args.claim:
+        claim_ids = db.resolve(args.claim)
+        if claim_ids:
+            print(f"Verifying against claimed identity '{args.claim}' ({len(claim_ids)} enrolled).")
+        else:
+            print(f"Claimed identity '{args.claim}' not enrolled, falling back to 1:N search.")
+
+    # State Management for Tracked IDs (fixed-capacity, see TrackState for fields)
+    track_states = TrackStateStore(capacity=config.MAX_TRACKS, max_memory_mb=config.TRACK_MEMORY_MB)
+    passive = PassiveLivenessDetector(
+        capacity=config.MAX_TRACKS,
+        window=config.PASSIVE_WINDOW,
+        motion_min=config.PASSIVE_MOTION_MIN,
+        texture_min=config.PASSIVE_TEXTURE_MIN,
+        jitter_min=config.PASSIVE_JITTER_MIN
+    ) if config.PASSIVE_LIVENESS_ENABLED else None
+    # Per-track latency from first detection to identity decision
+    tracer = AuthTracer(max_traces=config.TRACE_MAX_TRACES)
     
-    print("System Ready. Press 'q' to quit. Press 'r' to register the current face.")
+    if args.headless:
+        print("System Ready (headless). Press Ctrl+C to quit.")
+    else:
+        print("System Ready. Press 'q' to quit. Press 'r' to register the current face.")
     
     frame_count = 0
     fps_start_time = time.time()
     
     register_mode = False
     register_name_buffer = ""
+    faces_data = []
 
     try:
         while True:
@@ -75,114 +278,184 @@ def main():
                 break
             frame = cam.read()
             if frame is None:
+                if cam.finished: # End of a replayed session
+                    break
                 continue
 
+            if args.frames and frame_count >= args.frames:
+                break
             frame_count += 1
+            if recorder is not None:
+                recorder.write(frame, cam.last_timestamp)
             h, w, _ = frame.shape
+            # Frame time covers the whole loop iteration, preview included
+            qos.end_frame()
+            qos.start_frame()
 
             # 2. Detect Faces
-            faces_data = detector.process(frame)
-            
-            # 3. Prepare Rects for Tracker
-            rects = []
-            for face in faces_data:
-                rects.append(face['bbox']) # (x1, y1, x2, y2)
-            
-            # 4. Update Tracker
-            objects = tracker.update(rects)
+            # The motion gate suspends detection while the scene is empty and static;
+            # QoS may skip frames, tracks coast on the last boxes.
+            run_detection = True
+            woke = False
+            if gate is not None:
+                with qos.stage("motion"):
+                    motion = gate.update(frame)
+                    run_detection = gate.should_detect(motion, len(tracker.objects), frame_count)
+                woke = gate.woke
+                if gate.idle and not run_detection:
+                    faces_data = []
+
+            if run_detection and (woke or (gate is not None and gate.idle)
+                                  or frame_count % qos.detect_interval == 0 or frame_count == 1):
+                with qos.stage("detect"):
+                    faces_data = detector.process(frame, scale=qos.detect_scale)
+                if gate is not None:
+                    gate.detection_done()
             
-            # 5. Map Track IDs to Face Data
-            # We match tracker centroid to face bbox center
-            tracked_faces = []
-            for (objectID, centroid) in objects.items():
-                # Find closest face_data
-                best_match = None
-                min_dist = float('inf')
-                
+            with qos.stage("track"):
+                # 3. Prepare Rects for Tracker
+                rects = []
                 for face in faces_data:
-                    bbox = face['bbox']
-                    cx = (bbox[0] + bbox[2]) // 2
-                    cy = (bbox[1] + bbox[3]) // 2
-                    dist = calculate_distance(centroid, (cx, cy))
-                    if dist < 50: # Threshold to associate
-                        if dist < min_dist:
-                            min_dist = dist
-                            best_match = face
+                    rects.append(face['bbox']) # (x1, y1, x2, y2)
                 
-                if best_match:
-                    tracked_faces.append((objectID, best_match))
+                # 4. Update Tracker
+                objects = tracker.update(rects)
+                
+                # 5. Map Track IDs to Face Data
+                # We match tracker centroid to face bbox center
+                tracked_faces = []
+                for (objectID, centroid) in objects.items():
+                    # Find closest face_data
+                    best_match = None
+                    min_dist = float('inf')
+                    
+                    for face in faces_data:
+                        bbox = face['bbox']
+                        cx = (bbox[0] + bbox[2]) // 2
+                        cy = (bbox[1] + bbox[3]) // 2
+                        dist = calculate_distance(centroid, (cx, cy))
+                        if dist < 50: # Threshold to associate
+                            if dist < min_dist:
+                                min_dist = dist
+                                best_match = face
+                    
+                    if best_match:
+                        tracked_faces.append((objectID, best_match))
 
-            # Clean up old states
-            active_ids = objects.keys()
-            track_states = {k: v for k, v in track_states.items() if k in active_ids}
+            # Clean up old states (only the tracks the tracker dropped)
+            # Verified ones are remembered for re-identification
+            for object_id in tracker.pop_deregistered():
+                old_state = track_states.get(object_id)
+                if old_state is not None:
+                    reid.add(old_state)
+                    track_states.remove(object_id)
+                # Also covers tracks whose state the store already evicted
+                tracer.discard(object_id)
 
             # 6. Process Each Tracked Face
+            recognitions_left = qos.max_recognitions
+            # Head pose for every face at once; off-angle faces fail quality
+            # and never reach liveness or DeepFace
+            with qos.stage("quality"):
+                quality_checker.estimate_poses(frame, [face_data for _, face_data in tracked_faces])
             for track_id, face_data in tracked_faces:
                 bbox = face_data['bbox']
                 landmarks = face_data['landmarks']
                 
                 # Initialize state if new
-                if track_id not in track_states:
-                    track_states[track_id] = {
-                        'name': "Unknown",
-                        'verified': False,
-                        'liveness_status': "PENDING",
-                        'attributes': {},
-                        'challenge': None,
-                        'quality_ok': False,
-                        'embedding': None,
-                        'welcome_printed': False
-                    }
-                
-                state = track_states[track_id]
+                state, created = track_states.get_or_create(track_id, frame_count)
+                if created:
+                    audit.log("detection", track_id=track_id, bbox=[int(v) for v in bbox])
+                    tracer.event(track_id, "first_detection", state.created_at)
+                    if passive is not None:
+                        passive.reset(state.slot)
+                    # Someone we verified a moment ago, back after an occlusion?
+                    # Only a candidate until one encode confirms it (see C.)
+                    entry, descriptor = reid.match(frame, bbox)
+                    if entry is not None:
+                        state.reid_entry = entry
+                        state.descriptor = descriptor
+                        state.liveness_status = "PASSED"
+                        state.challenge = "PASSED"
+                state.bbox = bbox
 
                 # A. Quality Check
-                quality_ok, quality_details = quality_checker.evaluate(frame, face_data)
-                state['quality_ok'] = quality_ok
+                with qos.stage("quality"):
+                    quality_ok, quality_details = quality_checker.evaluate(frame, face_data)
+                state.quality_ok = quality_ok
+                if quality_ok and not state.identified:
+                    tracer.event(track_id, "first_quality_pass")
                 
                 # Draw Box (Red if bad quality/unknown, Green if verified)
                 color = "red"
-                if state['verified']: color = "green"
-                elif state['liveness_status'] == "PASSED": color = "yellow"
+                if state.verified: color = "green"
+                elif state.liveness_status == "PASSED": color = "yellow"
                 
                 ui.draw_box(frame, bbox, color, label=f"ID: {track_id}")
 
                 # B. Liveness Logic (Only if quality is OK and not yet passed)
-                if quality_ok and state['liveness_status'] != "PASSED":
-                    if state['challenge'] is None:
-                        # Start a challenge
-                        state['challenge'] = liveness_detector.start_new_challenge()
+                if quality_ok and state.liveness_status != "PASSED":
+                    # Passive check first: confident live faces skip the active challenge
+                    verdict = "UNCERTAIN"
+                    if passive is not None and state.liveness_obj is None:
+                        with qos.stage("liveness"):
+                            passive.update(state.slot, frame, bbox)
+                        verdict = passive.decide(state.slot)
+
+                    if verdict == "LIVE":
+                        audit.log("liveness", track_id=track_id, challenge="PASSIVE", result="PASSED")
+                        state.liveness_status = "PASSED"
+                        state.challenge = "PASSED"
+                        state.liveness_method = "passive"
+                        tracer.event(track_id, "challenge_pass")
+                        tracer.tag(track_id, liveness="passive")
+
+                    elif verdict == "PENDING":
+                        ui.draw_text(frame, "Liveness: CHECKING...", (bbox[0], bbox[1]-30), "yellow")
+
+                    else:
+                        if state.challenge is None:
+                            # Start a challenge
+                            state.challenge = liveness_detector.start_new_challenge()
                     
-                    # Update Liveness Detector with current challenge
-                    liveness_detector.current_challenge = state['challenge']
+                        # Update Liveness Detector with current challenge
+                        liveness_detector.current_challenge = state.challenge
                     
-                    # Pass landmarks to detector (we need to handle the state inside detector better for multiple faces? 
-                    # Actually LivenessDetector class stores state. If multiple faces, we need multiple instances or pass state in.
-                    # Simplified: We only auth one person at a time effectively, or reset detector.
-                    # BETTER: Instantiate LivenessDetector per track_id? 
-                    # For now, let's assume single-user interaction focus or reset for simplicity.
-                    # The current LivenessDetector holds state (counters). 
-                    # We will re-instantiate or use a dictionary in LivenessDetector.
-                    # For this prototype, we'll assume the FOCUSED user (closest/largest) drives the main LivenessDetector,
-                    # or just create a new one for each track in `track_states`.
+                        # Pass landmarks to detector (we need to handle the state inside detector better for multiple faces? 
+                        # Actually LivenessDetector class stores state. If multiple faces, we need multiple instances or pass state in.
+                        # Simplified: We only auth one person at a time effectively, or reset detector.
+                        # BETTER: Instantiate LivenessDetector per track_id? 
+                        # For now, let's assume single-user interaction focus or reset for simplicity.
+                        # The current LivenessDetector holds state (counters). 
+                        # We will re-instantiate or use a dictionary in LivenessDetector.
+                        # For this prototype, we'll assume the FOCUSED user (closest/largest) drives the main LivenessDetector,
+                        # or just create a new one for each track in `track_states`.
                     
-                    if 'liveness_obj' not in state:
-                        state['liveness_obj'] = LivenessDetector(
-                            ear_thresh=config.EAR_THRESHOLD, 
-                            mar_thresh=config.MAR_THRESHOLD, 
-                            head_turn_thresh=config.HEAD_TURN_THRESHOLD, 
-                            blink_consec_frames=config.BLINK_CONSEC_FRAMES
-                        )
-                        state['liveness_obj'].start_new_challenge()
-                        state['challenge'] = state['liveness_obj'].current_challenge
+                        if state.liveness_obj is None:
+                            state.liveness_obj = LivenessDetector(
+                                ear_thresh=config.EAR_THRESHOLD, 
+                                mar_thresh=config.MAR_THRESHOLD, 
+                                head_turn_thresh=config.HEAD_TURN_THRESHOLD, 
+                                blink_consec_frames=config.BLINK_CONSEC_FRAMES
+                            )
+                            state.liveness_obj.start_new_challenge()
+                            state.challenge = state.liveness_obj.current_challenge
+                            tracer.event(track_id, "challenge_start")
                     
-                    success, msg = state['liveness_obj'].process(landmarks, w, h)
+                        success, msg = state.liveness_obj.process(landmarks, w, h)
                     
-                    ui.draw_text(frame, f"Liveness: {state['challenge']} ({msg})", (bbox[0], bbox[1]-30), "yellow")
+                        ui.draw_text(frame, f"Liveness: {state.challenge} ({msg})", (bbox[0], bbox[1]-30), "yellow")
                     
-                    if success:
-                        state['liveness_status'] = "PASSED"
-                        state['challenge'] = "PASSED"
+                        if success:
+                            audit.log("liveness", track_id=track_id, challenge=state.challenge, result="PASSED")
+                            state.liveness_status = "PASSED"
+                            state.challenge = "PASSED"
+                            state.liveness_method = "active"
+                            tracer.event(track_id, "challenge_pass")
+                            tracer.tag(track_id, liveness="active")
+                        elif msg == "TIMEOUT" and not state.timeout_logged:
+                            audit.log("liveness", track_id=track_id, challenge=state.challenge, result="TIMEOUT")
+                            state.timeout_logged = True
                 
                 elif not quality_ok:
                     # Show why
@@ -195,49 +468,105 @@ def main():
                     ui.draw_text(frame, f"Quality Fail: {','.join(reasons)}", (bbox[0], bbox[3]+20), "red")
 
                 # C. Recognition & Analysis (Once Liveness Passed)
-                if state['liveness_status'] == "PASSED" and not state['verified']:
+                if state.liveness_status == "PASSED" and not state.verified:
                     
+                    # 0. Re-ID candidate: one encode + 1:1 verify against the lost track's embedding
+                    if state.reid_entry is not None and recognitions_left != 0:
+                        with qos.stage("recognition"):
+                            emb = recognizer.encode(frame, bbox)
+                        if recognitions_left is not None:
+                            recognitions_left -= 1
+                        if emb is not None:
+                            entry, state.reid_entry = state.reid_entry, None
+                            match, dist, conf = recognizer.verify_templates(emb, entry['template'], config.VERIFY_THRESHOLD)
+                            reid.resolve(entry, match)
+                            audit.log("reid", track_id=track_id, user_id=entry['user_id'], name=entry['name'],
+                                      distance=round(float(dist), 4), result="CONFIRMED" if match else "REJECTED")
+                            if match:
+                                state.name = entry['name']
+                                state.user_id = entry['user_id']
+                                state.conf = conf
+                                state.attributes = entry['attributes']
+                                state.embedding = emb
+                                state.identified = True
+                                state.verified = True
+                                tracer.discard(track_id, abandoned=False) # Carried over, not a fresh authentication
+                            else:
+                                # Someone else stepped into the spot: full authentication, challenge included
+                                state.liveness_status = "PENDING"
+                                state.challenge = None
+
                     # 1. Identify
-                    if state['embedding'] is None:
-                         # Encode
-                         emb = recognizer.encode(frame, bbox)
-                         if emb is not None:
-                             state['embedding'] = emb
-                             # Match
-                             uid, name, dist, conf = recognizer.identify(emb, known_embeddings, known_ids, known_names)
-                             state['name'] = name
-                             state['conf'] = conf
+                    if state.liveness_status == "PASSED" and state.reid_entry is None \
+                            and not state.identified and recognitions_left != 0:
+                         # Encode + Match through the LBP cascade
+                         # (QoS caps how many run per frame, the rest wait for the next one)
+                         spans = {}
+                         with qos.stage("recognition"):
+                             if claim_ids:
+                                 result = verify_claim(recognizer, cascade.descriptor, db, claim_ids, frame, bbox, spans)
+                             elif gallery is not None:
+                                 result = search_sharded(recognizer, cascade.descriptor, gallery,
+                                                         (known_embeddings, known_ids, known_names), frame, bbox, spans)
+                             else:
+                                 result = cascade.recognize(frame, bbox, known_embeddings, known_ids, known_names,
+                                                            known_descriptors, spans)
+                         if spans:
+                             tracer.event(track_id, "encode_start", spans["encode_start"])
+                             tracer.event(track_id, "encode_end", spans["encode_end"], overwrite=True)
+                         if recognitions_left is not None:
+                             recognitions_left -= 1
+                         if result is not None and result[4] is None:
+                             # LBP reject: only final after a few in a row, a
+                             # single jittery box can push an enrolled face past it
+                             state.lbp_rejects += 1
+                             if state.lbp_rejects < config.CASCADE_REJECT_FRAMES:
+                                 result = None
+                         if result is not None:
+                             uid, name, dist, conf, emb, descriptor = result
+                             state.identified = True
+                             state.embedding = emb
+                             state.descriptor = descriptor
+                             state.name = name
+                             state.user_id = uid
+                             state.conf = conf
+                             audit.log("identity", track_id=track_id, user_id=uid, name=name,
+                                       distance=round(float(dist), 4), confidence=round(float(conf), 4),
+                                       decision="ALLOW" if name != "Unknown" else "DENY")
+                             tracer.finish(track_id, "ALLOW" if name != "Unknown" else "DENY")
                              if name != "Unknown":
-                                 state['verified'] = True
+                                 state.verified = True
                     
                     # 2. Analyze (Attribute) - Run once
-                    if not state['attributes']:
-                         attrs = analyzer.analyze(frame, bbox)
-                         state['attributes'] = attrs
+                    if not state.attributes and state.liveness_status == "PASSED" and state.reid_entry is None \
+                            and qos.run_analysis:
+                         with qos.stage("analysis"):
+                             attrs = analyzer.analyze(frame, bbox)
+                         state.attributes = attrs
 
                 # D. Display Info
-                if state['verified']:
+                if state.verified:
                     # Welcome Message on UI
-                    welcome_msg = f"WELCOME {state['name'].upper()}"
+                    welcome_msg = f"WELCOME {state.name.upper()}"
                     ui.draw_text(frame, welcome_msg, (bbox[0], bbox[1] - 50), "green", scale=1.0, thickness=2)
 
                     # Console Welcome (once per track)
-                    if not state.get('welcome_printed', False):
-                        print(f"Welcome, {state['name']}!")
-                        state['welcome_printed'] = True
+                    if not state.welcome_printed:
+                        print(f"Welcome, {state.name}!")
+                        state.welcome_printed = True
 
                     info = [
-                        f"Name: {state['name']}",
-                        f"Conf: {state.get('conf', 0):.2f}",
-                        f"Age: {state['attributes'].get('age', '?')}",
-                        f"Gender: {state['attributes'].get('gender', '?')}",
-                        f"Emotion: {state['attributes'].get('emotion', '?')}"
+                        f"Name: {state.name}",
+                        f"Conf: {state.conf:.2f}",
+                        f"Age: {state.attributes.get('age', '?')}",
+                        f"Gender: {state.attributes.get('gender', '?')}",
+                        f"Emotion: {state.attributes.get('emotion', '?')}"
                     ]
                     for i, line in enumerate(info):
                         ui.draw_text(frame, line, (bbox[2]+10, bbox[1] + 20 + (i*20)), "green")
                 
                 # E. Registration Hook
-                if register_mode and state['quality_ok']:
+                if register_mode and state.quality_ok:
                     # Auto capture if one face
                     if len(tracked_faces) == 1:
                         # Pause updates
@@ -253,27 +582,51 @@ def main():
                         if name:
                             emb = recognizer.encode(frame, bbox)
                             if emb is not None:
-                                db.add_user(name, emb, state['attributes'])
+                                descriptor = cascade.descriptor.compute(frame, bbox)
+                                user_id = db.add_user(name, emb, state.attributes, descriptor=descriptor)
+                                crop, box = archive.crop(frame, bbox)
+                                if crop is not None:
+                                    archive.add(user_id, crop, box)
+                                audit.log("registration", track_id=track_id, user_id=user_id, name=name)
                                 print(f"User {name} added successfully.")
                                 # Reload DB
                                 known_ids, known_names, known_embeddings = db.get_all_embeddings()
+                                known_descriptors = db.get_all_descriptors()
+                                if gallery is not None:
+                                    gallery.add_user(user_id, name, emb)
                             else:
                                 print("Failed to encode face. Try again.")
                         else:
                             print("Registration cancelled.")
 
             # 7. Global UI
+            idle = gate is not None and gate.idle
             fps = frame_count / (time.time() - fps_start_time)
-            stats = {
-                "FPS": f"{fps:.1f}",
-                "Faces": len(tracked_faces),
-                "Mode": "REGISTER (Press 'r')" if not register_mode else "CAPTURING...",
-            }
-            ui.draw_dashboard(frame, stats)
+            if idle:
+                # Skip the dashboard blend while idle; hold the loop at config.FPS
+                ui.draw_text(frame, "IDLE", (20, 30), "white")
+                spare = 1.0 / config.FPS - (time.perf_counter() - qos.frame_start)
+                if spare > 0:
+                    time.sleep(spare)
+                qos.idle() # Paced frames say nothing about load
+            else:
+                stats = {
+                    "FPS": f"{fps:.1f}",
+                    "Faces": len(tracked_faces),
+                    "Mode": "REGISTER (Press 'r')" if not register_mode else "CAPTURING...",
+                    "QoS": qos.status(),
+                }
+                slowest, cost = qos.slowest_stage()
+                if slowest:
+                    stats["Slowest"] = f"{slowest} {cost * 1000:.0f}ms"
+                ui.draw_dashboard(frame, stats)
             
             # Show Mesh (Optional, good for debug)
             # detector.draw_landmarks(frame, faces_data) 
 
+            if args.headless:
+                continue
+
             cv2.imshow("Facial Auth System", frame)
             
             key = cv2.waitKey(1) & 0xFF
@@ -282,11 +635,45 @@ def main():
             if key == ord('r'):
                 print("Switching to Registration Mode...")
                 register_mode = True
+            if key == ord('n') and args.replay and args.replay_mode == "step":
+                cam.step()
 
+    except KeyboardInterrupt:
+        pass
     finally:
+        elapsed = time.time() - fps_start_time
+        if frame_count:
+            print(f"Processed {frame_count} frames in {elapsed:.1f}s ({frame_count / elapsed:.1f} FPS).")
         if cam is not None:
             cam.stop()
-        cv2.destroyAllWindows()
+        if recorder is not None:
+            recorder.stop()
+            print(recorder.report())
+        detector.close()
+        if gallery is not None:
+            gallery.stop()
+        audit.stop()
+        if cascade.faces:
+            print(f"Cascade: {cascade.deep_calls}/{cascade.faces} faces needed deep inference "
+                  f"({cascade.avoided_fraction:.0%} avoided).")
+        if reid.hits or reid.misses or reid.rejected:
+            print(f"Re-ID: {reid.hits} hits / {reid.hits + reid.misses + reid.rejected} lookups ({reid.hit_rate:.0%}), "
+                  f"{reid.rejected} rejected by the embedding check, {reid.inferences_saved} inferences saved.")
+        if preprocessor.crops:
+            print(f"Preprocessing: {preprocessor.crops} face crops, {preprocessor.hits} reused across models.")
+        if embedding_cache is not None and (embedding_cache.hits or embedding_cache.misses):
+            print(embedding_cache.report())
+        for line in tracer.report():
+            print(line)
+        if args.trace:
+            tracer.export_chrome_trace(args.trace)
+            print(f"Wrote {len(tracer.completed)} traces to {args.trace}.")
+        if gate is not None:
+            print(gate.report())
+        if audit.dropped:
+            print(f"Warning: {audit.dropped} audit events dropped (queue full).")
+        if not args.headless:
+            cv2.destroyAllWindows()
         print("System Shutdown.")
 
 if __name__ == "__main__":
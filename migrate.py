@@ -0,0 +1,156 @@
+"""
+Re-embeds the enrollment crop archive with a new recognition model.
+
+Batches of archived crops are encoded on a process pool (one model copy per
+worker). Every batch that encoded without failures is written to the work
+directory, which is the checkpoint: an interrupted run picks up where it
+stopped and batches with failed encodes are retried. The result goes
+into a new embedding column next to the live one; --switch then makes it
+live for every user in one atomic database write.
+
+    python migrate.py Facenet512 --workers 4
+    python migrate.py Facenet512 --switch
+"""
+import os
+import argparse
+import time
+
+# Suppress TensorFlow and Keras warnings
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # FATAL
+os.environ['TF_ENABLE_ONEDNN_OPTS'] = '0'
+
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+import config
+from modules.archive import CropArchive
+from modules.database import Database
+
+_recognizer = None
+
+
+def _init_worker(model_name):
+    global _recognizer
+    from modules.recognition import FaceRecognizer
+    _recognizer = FaceRecognizer(model_name=model_name)
+
+
+def _embed_batch(archive_dir, chunk, start, end):
+    archive = CropArchive(archive_dir)
+    user_ids, crops, boxes = archive.read_chunk(chunk)
+    ids, embeddings = [], []
+    t0 = time.perf_counter()
+    for user_id, crop, box in zip(user_ids[start:end], crops[start:end], boxes[start:end]):
+        # Encode the face box, not the whole crop: same framing as live probes
+        emb = _recognizer.encode(crop, tuple(int(v) for v in box))
+        if emb is not None:
+            ids.append(user_id)
+            embeddings.append(emb)
+    return chunk, start, end, ids, embeddings, time.perf_counter() - t0
+
+
+def batch_path(work_dir, chunk, start, end):
+    # end is part of the name: the open last chunk grows, its batches change
+    return os.path.join(work_dir, f"{os.path.splitext(chunk)[0]}_{start:05d}_{end:05d}.npz")
+
+
+def plan(archive, batch_size):
+    """[(chunk, start, end)] covering every archived crop."""
+    batches = []
+    for entry in archive.index["chunks"]:
+        for start in range(0, entry["count"], batch_size):
+            batches.append((entry["name"], start, min(start + batch_size, entry["count"])))
+    return batches
+
+
+def run(args, archive, work_dir, batches):
+    os.makedirs(work_dir, exist_ok=True)
+    todo = [b for b in batches if not os.path.exists(batch_path(work_dir, *b))]
+    print(f"{len(archive)} crops in {len(batches)} batches, {len(batches) - len(todo)} already done.")
+    if not todo:
+        return
+
+    crops = failed = 0
+    busy = 0.0
+    wall = time.perf_counter()
+    ctx = mp.get_context("spawn")
+    with ProcessPoolExecutor(args.workers, mp_context=ctx, initializer=_init_worker,
+                             initargs=(args.model,)) as pool:
+        futures = [pool.submit(_embed_batch, archive.archive_dir, *b) for b in todo]
+        for i, future in enumerate(as_completed(futures), 1):
+            chunk, start, end, ids, embeddings, elapsed = future.result()
+            count = end - start
+            crops += count
+            failed += count - len(ids)
+            busy += elapsed
+            if len(ids) < count:
+                # Not checkpointed: the whole batch is retried on the next run
+                print(f"  batch {i}/{len(todo)}: {chunk}[{start}:{end}] {count - len(ids)} failed, will retry")
+                continue
+            # Write then rename: a batch file exists only once it is complete
+            path = batch_path(work_dir, chunk, start, end)
+            np.savez(path + ".tmp.npz", user_ids=np.array(ids, dtype=str),
+                     embeddings=np.array(embeddings, dtype=np.float32))
+            os.replace(path + ".tmp.npz", path)
+            print(f"  batch {i}/{len(todo)}: {chunk}[{start}:{end}] in {elapsed:.1f}s")
+    wall = time.perf_counter() - wall
+
+    print(f"Encoded {crops} crops ({failed} failed) in {wall:.1f}s: "
+          f"{crops / wall:.1f} crops/s overall, {crops / wall / args.workers:.1f} crops/s per core "
+          f"({crops / busy if busy else 0.0:.1f} crops/s per busy worker).")
+
+
+def collect(work_dir, batches):
+    """Mean embedding per user over the finished batches of the current plan."""
+    sums, counts = {}, {}
+    for batch in batches:
+        path = batch_path(work_dir, *batch)
+        if not os.path.exists(path):
+            continue
+        with np.load(path) as data:
+            for user_id, emb in zip(data["user_ids"].tolist(), data["embeddings"]):
+                sums[user_id] = sums.get(user_id, 0) + emb
+                counts[user_id] = counts.get(user_id, 0) + 1
+    return {user_id: sums[user_id] / counts[user_id] for user_id in sums}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-embed enrolled users with a new recognition model")
+    parser.add_argument("model", help="DeepFace model name, e.g. Facenet512, ArcFace")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch", type=int, default=config.ARCHIVE_CHUNK_SIZE, help="Crops per task")
+    parser.add_argument("--work-dir", default=None, help="Checkpoint directory (default: <archive>/migrate_<model>)")
+    parser.add_argument("--switch", action="store_true", help="Make the new column live once every user has it")
+    args = parser.parse_args()
+
+    archive = CropArchive(config.ARCHIVE_DIR)
+    db = Database(config.DB_PATH)
+    work_dir = args.work_dir or os.path.join(config.ARCHIVE_DIR, f"migrate_{args.model}")
+
+    if db.active_model() == args.model:
+        print(f"{args.model} is already the live model.")
+        return
+
+    batches = plan(archive, args.batch)
+    run(args, archive, work_dir, batches)
+    if os.path.isdir(work_dir):
+        embeddings = collect(work_dir, batches)
+        db.set_model_embeddings(args.model, embeddings)
+        print(f"Wrote {args.model} embeddings for {len(embeddings)} users next to {db.active_model()}.")
+
+    missing = db.missing_model(args.model)
+    if missing:
+        # Enrolled before the archive existed, or every crop failed to encode
+        print(f"{len(missing)} users have no {args.model} embedding and need to re-enroll.")
+
+    if args.switch:
+        if db.switch_model(args.model):
+            print(f"Switched live embeddings to {args.model}.")
+        else:
+            print("Not switching: some users are missing the new embedding.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,29 +1,41 @@
-try:
-    from deepface import DeepFace
-except ImportError:
-    print("Warning: DeepFace not installed. Attribute analysis will fail.")
-    DeepFace = None
+from .recognition import load_deepface
 
 class FaceAnalyzer:
-    def __init__(self):
-        pass
+    # Age and gender are VGG-Face based (224x224); emotion converts to 48x48 gray itself
+    input_size = 224
+
+    def __init__(self, cache=None, preprocessor=None):
+        self.actions = ['age', 'gender', 'emotion']
+        self.cache = cache # Optional EmbeddingCache, keyed by crop content
+        self.preprocessor = preprocessor # Optional FacePreprocessor shared with FaceRecognizer
 
     def analyze(self, frame, bbox):
         """
         Predict Age, Gender, Emotion.
         """
+        DeepFace = load_deepface()
         if DeepFace is None:
             return {}
 
-        # Crop face
-        x1, y1, x2, y2 = bbox
-        h, w, _ = frame.shape
-        x1, y1 = max(0, x1), max(0, y1)
-        x2, y2 = min(w, x2), min(h, y2)
-        
-        face_img = frame[y1:y2, x1:x2]
-        if face_img.size == 0:
-            return {}
+        # Crop face (shared with recognition when a preprocessor is set)
+        if self.preprocessor is not None:
+            face_img = self.preprocessor.crop(frame, bbox, self.input_size)
+            if face_img is None:
+                return {}
+        else:
+            x1, y1, x2, y2 = bbox
+            h, w, _ = frame.shape
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(w, x2), min(h, y2)
+            
+            face_img = frame[y1:y2, x1:x2]
+            if face_img.size == 0:
+                return {}
+
+        if self.cache is not None:
+            attrs, key = self.cache.get("analyze", ",".join(self.actions), face_img)
+            if attrs is not None:
+                return attrs
 
         try:
             # DeepFace expects RGB usually, but handles BGR if backend is opencv? 
@@ -31,7 +43,7 @@ class FaceAnalyzer:
             # enforce_detection=False because we already cropped it.
             results = DeepFace.analyze(
                 img_path=face_img, 
-                actions=['age', 'gender', 'emotion'],
+                actions=self.actions,
                 enforce_detection=False,
                 silent=True,
                 detector_backend='skip' # Important for speed
@@ -43,12 +55,15 @@ class FaceAnalyzer:
             else:
                 res = results
                 
-            return {
+            attrs = {
                 "age": res.get("age"),
                 "gender": res.get("dominant_gender"),
                 "emotion": res.get("dominant_emotion"),
                 "emotion_score": res.get("emotion") # dict of scores
             }
+            if self.cache is not None:
+                self.cache.put(key, attrs)
+            return attrs
         except Exception as e:
             # print(f"Analysis error: {e}")
             return {}
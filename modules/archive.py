@@ -0,0 +1,93 @@
+import cv2
+import json
+import numpy as np
+import os
+
+class CropArchive:
+    """
+    Chunked archive of enrollment face crops, so the gallery can be
+    re-embedded with a different model without re-enrolling anyone.
+    Crops are square, fixed-size BGR images stored in compressed .npz
+    chunks of `chunk_size` crops alongside the user ID of each crop and
+    the face box inside the crop (the crop itself carries `margin` of
+    context, the box is what live probes are encoded from).
+    index.json lists the chunks; the last chunk stays open until full.
+    """
+    def __init__(self, archive_dir, chunk_size=64, crop_size=160, margin=0.2):
+        self.archive_dir = archive_dir
+        self.chunk_size = chunk_size
+        self.crop_size = crop_size
+        self.margin = margin
+        self.index_path = os.path.join(archive_dir, "index.json")
+        self.index = {"crop_size": crop_size, "chunks": []}
+        self.load()
+
+    def load(self):
+        if os.path.exists(self.index_path):
+            with open(self.index_path, "r") as f:
+                self.index = json.load(f)
+            self.crop_size = self.index.get("crop_size", self.crop_size)
+
+    def _save_index(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.index, f, indent=4)
+        os.replace(tmp, self.index_path)
+
+    def crop(self, frame, bbox):
+        """
+        Square crop around the face box with some margin, resized to crop_size.
+        Haar gives no landmarks, so the box centre is the alignment anchor.
+        Returns (crop, box) with box the face box in crop coordinates, or (None, None).
+        """
+        bx1, by1, bx2, by2 = bbox
+        h, w = frame.shape[:2]
+        cx, cy = (bx1 + bx2) / 2, (by1 + by2) / 2
+        half = max(bx2 - bx1, by2 - by1) * (1 + self.margin) / 2
+        x1, y1 = int(max(0, cx - half)), int(max(0, cy - half))
+        x2, y2 = int(min(w, cx + half)), int(min(h, cy + half))
+        face_img = frame[y1:y2, x1:x2]
+        if face_img.size == 0:
+            return None, None
+        sx, sy = self.crop_size / (x2 - x1), self.crop_size / (y2 - y1)
+        box = (
+            int(round((max(bx1, x1) - x1) * sx)), int(round((max(by1, y1) - y1) * sy)),
+            int(round((min(bx2, x2) - x1) * sx)), int(round((min(by2, y2) - y1) * sy))
+        )
+        crop = cv2.resize(face_img, (self.crop_size, self.crop_size), interpolation=cv2.INTER_AREA)
+        return crop, box
+
+    def add(self, user_id, crop, box):
+        os.makedirs(self.archive_dir, exist_ok=True)
+        chunks = self.index["chunks"]
+        if not chunks or chunks[-1]["count"] >= self.chunk_size:
+            chunks.append({"name": f"chunk_{len(chunks):05d}.npz", "count": 0})
+        chunk = chunks[-1]
+
+        user_ids, crops, boxes = [], [], []
+        if chunk["count"]:
+            user_ids, crops, boxes = self.read_chunk(chunk["name"])
+            user_ids, crops, boxes = list(user_ids), list(crops), list(boxes)
+        user_ids.append(user_id)
+        crops.append(crop)
+        boxes.append(box)
+
+        path = os.path.join(self.archive_dir, chunk["name"])
+        tmp = path + ".tmp.npz"
+        np.savez_compressed(tmp, user_ids=np.array(user_ids), crops=np.stack(crops),
+                            boxes=np.array(boxes, dtype=np.int32))
+        os.replace(tmp, path)
+        chunk["count"] = len(user_ids)
+        self._save_index()
+
+    def read_chunk(self, name):
+        """(user_ids, crops, boxes) of one chunk."""
+        with np.load(os.path.join(self.archive_dir, name)) as data:
+            return data["user_ids"].tolist(), data["crops"], data["boxes"]
+
+    def chunks(self):
+        """Names of all chunks, oldest first."""
+        return [c["name"] for c in self.index["chunks"]]
+
+    def __len__(self):
+        return sum(c["count"] for c in self.index["chunks"])
@@ -0,0 +1,199 @@
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+class AuditLog:
+    """
+    Structured authentication audit trail.
+    log() only enqueues; a background thread writes events in batches as
+    JSONL, fsyncs every `fsync_interval` seconds and rotates the file by
+    size or age. When the queue is full events are dropped and counted
+    rather than blocking the frame loop.
+    """
+    def __init__(self, path, queue_size=10000, batch_size=256, flush_interval=0.5,
+                 fsync_interval=5.0, max_bytes=10 * 1024 * 1024, rotate_interval=24 * 3600):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+
+        self.file = None
+        self.first_ts = None
+        self.last_ts = None
+        self.opened_at = 0
+        self.last_fsync = time.time()
+
+        self.started = False
+        self.thread = None
+
+    def start(self):
+        if self.started:
+            return self
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._open()
+        self.started = True
+        self.thread = threading.Thread(target=self.update, args=())
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def log(self, event, **fields):
+        """
+        Queue an event. Never blocks.
+        """
+        record = {"ts": round(time.time(), 3), "event": event}
+        record.update(fields)
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def update(self):
+        while self.started or not self.queue.empty():
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                pass
+
+            if batch:
+                self._write(batch)
+
+            now = time.time()
+            if now - self.last_fsync >= self.fsync_interval:
+                self._fsync()
+
+    def _write(self, batch):
+        lines = []
+        for record in batch:
+            # 'ts' is always the first key so readers can parse it without json.loads
+            lines.append(json.dumps(record, separators=(",", ":"), default=str))
+        self.file.write("\n".join(lines) + "\n")
+        self.file.flush()
+        self.written += len(batch)
+
+        if self.first_ts is None:
+            self.first_ts = batch[0]["ts"]
+        self.last_ts = batch[-1]["ts"]
+
+        if self.file.tell() >= self.max_bytes or time.time() - self.opened_at >= self.rotate_interval:
+            self._rotate()
+
+    def _open(self):
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.opened_at = time.time()
+        self.first_ts = None
+        self.last_ts = None
+        if self.file.tell() > 0:
+            # Appending to an existing log: recover its time range
+            first, last = _file_range(self.path)
+            self.first_ts, self.last_ts = first, last
+
+    def _fsync(self):
+        if self.file is not None:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        self.last_fsync = time.time()
+
+    def _rotate(self):
+        self._fsync()
+        self.file.close()
+        if self.first_ts is not None:
+            # Rotated files carry their time range in the name, so queries can skip them
+            target = f"{self.path}.{self.first_ts:.3f}-{self.last_ts:.3f}"
+            n = 0
+            while os.path.exists(target if n == 0 else f"{target}_{n}"):
+                n += 1
+            os.replace(self.path, target if n == 0 else f"{target}_{n}")
+        self._open()
+
+    def stop(self):
+        if not self.started:
+            return
+        self.started = False
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
+        self._fsync()
+        self.file.close()
+        self.file = None
+
+
+def _parse_ts(line):
+    # Lines start with {"ts":<float>,
+    return float(line[6:line.index(",")])
+
+
+def _file_range(path):
+    first = last = None
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                ts = _parse_ts(line)
+                if first is None:
+                    first = ts
+                last = ts
+    return first, last
+
+
+def log_files(path, start=None, end=None):
+    """
+    Log files (oldest first) that may contain events within [start, end].
+    """
+    files = []
+    for rotated in glob.glob(glob.escape(path) + ".*-*"):
+        try:
+            first, last = rotated[len(path) + 1:].split("-")
+            first, last = float(first), float(last.split("_")[0])
+        except ValueError:
+            continue
+        if (start is not None and last < start) or (end is not None and first > end):
+            continue
+        files.append((first, rotated))
+    files.sort()
+    files = [f for _, f in files]
+    if os.path.exists(path):
+        files.append(path)
+    return files
+
+
+def read_events(path, start=None, end=None, user_id=None, event=None):
+    """
+    Yields events with start <= ts <= end, optionally filtered by user ID
+    and event type. Files outside the range are skipped by name, and lines
+    are pre-filtered on their raw text before being decoded.
+    """
+    user_key = None
+    if user_id is not None:
+        user_key = '"user_id":' + json.dumps(user_id)
+    event_key = None
+    if event is not None:
+        event_key = '"event":' + json.dumps(event)
+
+    for log_file in log_files(path, start, end):
+        with open(log_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                ts = _parse_ts(line)
+                if start is not None and ts < start:
+                    continue
+                if end is not None and ts > end:
+                    break # Events are written in time order
+                if user_key is not None and user_key not in line:
+                    continue
+                if event_key is not None and event_key not in line:
+                    continue
+                yield json.loads(line)
@@ -10,6 +10,9 @@ class Camera:
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
         
         self.grabbed, self.frame = self.cap.read()
+        self.timestamp = time.time() # Capture time of self.frame
+        self.last_timestamp = None # Capture time of the frame returned by the last read()
+        self.finished = False # Live devices never run out (see ReplayCamera)
         self.started = False
         self.read_lock = threading.Lock()
         
@@ -26,15 +29,18 @@ class Camera:
     def update(self):
         while self.started:
             grabbed, frame = self.cap.read()
+            timestamp = time.time()
             with self.read_lock:
                 self.grabbed = grabbed
                 self.frame = frame
+                self.timestamp = timestamp
             time.sleep(0.01) # Small sleep to prevent CPU hogging
 
     def read(self):
         with self.read_lock:
             if not self.grabbed:
                 return None
+            self.last_timestamp = self.timestamp
             return self.frame.copy()
 
     def stop(self):
@@ -2,10 +2,16 @@ import numpy as np
 import json
 import os
 
+DEFAULT_MODEL = "VGG-Face"
+
 class Database:
     def __init__(self, db_path):
         self.db_path = db_path
         self.users = {}
+        # 1:1 verification index: user_id -> (N, D) unit-norm float32 templates,
+        # lower-cased name -> [user_id, ...]
+        self.templates = {}
+        self.name_index = {}
         self.load()
 
     def load(self):
@@ -16,10 +22,28 @@ class Database:
                     # Convert list embeddings back to numpy arrays
                     for user_id, data in self.users.items():
                         data['embedding'] = np.array(data['embedding'])
+                        # Columns from other models written by migrate.py, side by side
+                        for model, emb in data.get('embeddings', {}).items():
+                            data['embeddings'][model] = np.array(emb)
+                        if data.get('descriptor') is not None:
+                            data['descriptor'] = np.array(data['descriptor'], dtype=np.float32)
                 except json.JSONDecodeError:
                     self.users = {}
         else:
             self.users = {}
+        self.build_index()
+
+    def build_index(self):
+        self.templates = {}
+        self.name_index = {}
+        for user_id, data in self.users.items():
+            self.index_user(user_id, data)
+
+    def index_user(self, user_id, data):
+        rows = np.atleast_2d(np.asarray(data['embedding'], dtype=np.float32))
+        norms = np.linalg.norm(rows, axis=1, keepdims=True)
+        self.templates[user_id] = rows / np.maximum(norms, 1e-12)
+        self.name_index.setdefault(data['name'].strip().lower(), []).append(user_id)
 
     def save(self):
         # Convert numpy arrays to lists for JSON serialization
@@ -30,25 +54,96 @@ class Database:
                 serializable_users[user_id]['embedding'] = data['embedding'].tolist()
             else:
                 serializable_users[user_id]['embedding'] = data['embedding']
+            if isinstance(data.get('descriptor'), np.ndarray):
+                serializable_users[user_id]['descriptor'] = data['descriptor'].tolist()
+            if 'embeddings' in data:
+                serializable_users[user_id]['embeddings'] = {
+                    model: np.asarray(emb).tolist() for model, emb in data['embeddings'].items()
+                }
         
         # Ensure directory exists
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
         
-        with open(self.db_path, 'w') as f:
+        # Write then rename, a crash mid-save never leaves a truncated database
+        tmp_path = self.db_path + '.tmp'
+        with open(tmp_path, 'w') as f:
             json.dump(serializable_users, f, indent=4)
+        os.replace(tmp_path, self.db_path)
 
-    def add_user(self, name, embedding, metadata=None):
+    def add_user(self, name, embedding, metadata=None, descriptor=None, model=None):
         import uuid
         user_id = str(uuid.uuid4())
         self.users[user_id] = {
             "name": name,
             "embedding": embedding,
+            "model": model or self.active_model(),
             "metadata": metadata or {},
             "created_at": str(np.datetime64('now'))
         }
+        if descriptor is not None:
+            # Cheap LBP descriptor for the cascade pre-filter
+            self.users[user_id]["descriptor"] = descriptor
+        self.index_user(user_id, self.users[user_id])
         self.save()
         return user_id
 
+    def active_model(self):
+        """Model the live 'embedding' column was produced by."""
+        for data in self.users.values():
+            return data.get('model', DEFAULT_MODEL)
+        return DEFAULT_MODEL
+
+    def set_model_embeddings(self, model, embeddings):
+        """
+        Writes a new embedding column (user_id -> embedding) next to the live
+        one. Recognition keeps using the live column until switch_model().
+        """
+        for user_id, emb in embeddings.items():
+            if user_id in self.users:
+                self.users[user_id].setdefault('embeddings', {})[model] = np.asarray(emb)
+        self.save()
+
+    def missing_model(self, model):
+        """User IDs that have no embedding for `model` yet."""
+        return [
+            user_id for user_id, data in self.users.items()
+            if data.get('model', DEFAULT_MODEL) != model and model not in data.get('embeddings', {})
+        ]
+
+    def switch_model(self, model):
+        """
+        Makes `model` the live column for every user at once; the previous
+        column is kept under 'embeddings' so the switch can be reverted.
+        Refuses (returns False) while any user is missing the new column.
+        """
+        if self.missing_model(model):
+            return False
+        for data in self.users.values():
+            current = data.get('model', DEFAULT_MODEL)
+            if current == model:
+                continue
+            columns = data.setdefault('embeddings', {})
+            columns[current] = data['embedding']
+            data['embedding'] = columns.pop(model)
+            data['model'] = model
+        self.save() # Single atomic file replace
+        self.build_index()
+        return True
+
+    def resolve(self, user_id=None, name=None):
+        """
+        Returns the user IDs a claim refers to: the ID itself if enrolled,
+        else every user with that name (case-insensitive).
+        """
+        if user_id is not None and user_id in self.templates:
+            return [user_id]
+        key = (name if name is not None else user_id or "").strip().lower()
+        return list(self.name_index.get(key, []))
+
+    def get_templates(self, user_id):
+        """Unit-norm template rows for one user, or None. O(1)."""
+        return self.templates.get(user_id)
+
     def get_all_embeddings(self):
         ids = []
         embeddings = []
@@ -58,3 +153,10 @@ class Database:
             embeddings.append(data['embedding'])
             names.append(data['name'])
         return ids, names, embeddings
+
+    def get_all_descriptors(self):
+        """
+        Cheap descriptors in the same order as get_all_embeddings().
+        Users enrolled before the cascade existed have None.
+        """
+        return [data.get('descriptor') for data in self.users.values()]
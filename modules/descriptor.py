@@ -0,0 +1,91 @@
+import cv2
+import numpy as np
+
+def _uniform_lbp_table():
+    """
+    Maps the 256 LBP codes to 59 bins: one per uniform pattern
+    (at most two 0/1 transitions) and a shared bin for the rest.
+    """
+    table = np.full(256, 58, dtype=np.uint8)
+    next_bin = 0
+    for code in range(256):
+        bits = [(code >> i) & 1 for i in range(8)]
+        transitions = sum(bits[i] != bits[(i + 1) % 8] for i in range(8))
+        if transitions <= 2:
+            table[code] = next_bin
+            next_bin += 1
+    return table
+
+_LBP_TABLE = _uniform_lbp_table()
+
+class FaceDescriptor:
+    """
+    Cheap appearance descriptor: uniform LBP histograms over a grid of cells
+    on a normalized face crop. Pure NumPy/OpenCV, well under a millisecond
+    per face, used to pre-filter the gallery before running the deep model.
+    Vectors are L2 normalized square-rooted histograms, so the Euclidean
+    distance between two of them is the Hellinger distance (0 to sqrt(2)).
+    """
+    def __init__(self, size=64, grid=4):
+        self.size = size
+        self.grid = grid
+        self.bins = 59
+        self.dim = grid * grid * self.bins
+        self.clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(4, 4))
+
+    def crop(self, frame, bbox):
+        """
+        Normalized crop: the inner part of the Haar box (drops hair and
+        background at the edges), grayscale, fixed size, contrast equalized.
+        """
+        x1, y1, x2, y2 = bbox
+        h, w = frame.shape[:2]
+        bw, bh = x2 - x1, y2 - y1
+        x1, x2 = x1 + bw // 10, x2 - bw // 10
+        y1, y2 = y1 + bh // 10, y2 - bh // 20
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+
+        face_img = frame[y1:y2, x1:x2]
+        if face_img.size == 0:
+            return None
+        if face_img.ndim == 3:
+            face_img = cv2.cvtColor(face_img, cv2.COLOR_BGR2GRAY)
+        face_img = cv2.resize(face_img, (self.size, self.size), interpolation=cv2.INTER_AREA)
+        return self.clahe.apply(face_img)
+
+    def compute(self, frame, bbox):
+        gray = self.crop(frame, bbox)
+        if gray is None:
+            return None
+
+        # 8-neighbour LBP on the interior pixels, vectorized with shifted views
+        g = gray.astype(np.int16)
+        c = g[1:-1, 1:-1]
+        codes = np.zeros(c.shape, dtype=np.uint8)
+        neighbours = [(-1, -1), (-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1)]
+        for bit, (dy, dx) in enumerate(neighbours):
+            n = g[1 + dy:g.shape[0] - 1 + dy, 1 + dx:g.shape[1] - 1 + dx]
+            codes |= (n >= c).astype(np.uint8) << bit
+        codes = _LBP_TABLE[codes]
+
+        # Per-cell histograms in one bincount: offset each cell's bins
+        cell = codes.shape[0] // self.grid
+        codes = codes[:cell * self.grid, :cell * self.grid]
+        cell_idx = (np.arange(cell * self.grid) // cell)
+        offsets = (cell_idx[:, None] * self.grid + cell_idx[None, :]) * self.bins
+        hist = np.bincount((offsets + codes).ravel(), minlength=self.dim).astype(np.float32)
+
+        hist = np.sqrt(hist / max(hist.sum(), 1.0))
+        norm = np.linalg.norm(hist)
+        return hist / norm if norm > 0 else hist
+
+    def distances(self, descriptor, gallery):
+        """
+        Distances from one descriptor to every row of a gallery matrix.
+        """
+        gallery = np.asarray(gallery, dtype=np.float32)
+        if gallery.size == 0:
+            return np.zeros(0, dtype=np.float32)
+        # |a - b|^2 = 2 - 2 a.b for unit vectors
+        return np.sqrt(np.maximum(0.0, 2.0 - 2.0 * (gallery @ descriptor)))
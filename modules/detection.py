@@ -1,32 +1,154 @@
 import cv2
 import numpy as np
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .geometry import non_max_suppression
 
 class FaceProcessor:
-    def __init__(self, min_detection_confidence=0.7, min_tracking_confidence=0.7):
+    def __init__(self, min_detection_confidence=0.7, min_tracking_confidence=0.7,
+                 tiles=(1, 1), threads=None, min_face=50, max_face=None,
+                 row_face_sizes=None, nms_overlap=0.3):
         # Using Haar Cascade for speed as MediaPipe is unavailable
-        cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
-        self.detector = cv2.CascadeClassifier(cascade_path)
+        self.cascade_path = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+        self.detector = cv2.CascadeClassifier(self.cascade_path)
         if self.detector.empty():
             print("Error: Could not load Haar Cascade XML.")
+        # detectMultiScale keeps per-image state in the classifier, so every
+        # tile thread gets its own copy
+        self.local = threading.local()
 
-    def process(self, frame):
+        # Tiled mode: the frame is split into overlapping tiles that are searched
+        # in parallel. OpenCV releases the GIL inside detectMultiScale.
+        self.tiles = tuple(tiles) if tiles else (1, 1)
+        self.min_face = min_face
+        self.max_face = max_face # None = no upper bound (a face close to the camera)
+        self.row_face_sizes = row_face_sizes
+        self.nms_overlap = nms_overlap
+        self.threads = threads or os.cpu_count() or 1
+
+        self.pool = None
+        self.cv_threads = None # OpenCV thread count to restore on close()
+        if self.tiles != (1, 1):
+            # Tiles overlap by half the largest face, so tiling needs that bound:
+            # without one the overlap is half a tile and most of the frame is scanned twice
+            if max_face is None and not row_face_sizes:
+                raise ValueError("Tiled detection needs max_face (or row_face_sizes) to bound the tile overlap")
+            self.pool = ThreadPoolExecutor(max_workers=self.threads)
+            # detectMultiScale runs its own parallel_for; split the cores between
+            # the tile threads and OpenCV instead of oversubscribing them
+            self.cv_threads = cv2.getNumThreads()
+            cv2.setNumThreads(max(1, (os.cpu_count() or 1) // self.threads))
+        self._tile_cache = (None, [])
+
+    def get_tiles(self, frame_w, frame_h, scale=1.0):
+        """
+        Returns a list of (x1, y1, x2, y2, min_face, max_face) tiles.
+        Tiles overlap by the largest face expected in them, so every face
+        lies fully inside at least one tile.
+        Cached per frame size and scale.
+        """
+        if self._tile_cache[0] == (frame_w, frame_h, scale):
+            return self._tile_cache[1]
+
+        cols, rows = self.tiles
+        tile_w = frame_w / cols
+        tile_h = frame_h / rows
+
+        tiles = []
+        for r in range(rows):
+            min_face, max_face = self.min_face, self.max_face
+            if self.row_face_sizes and r < len(self.row_face_sizes):
+                min_face, max_face = self.row_face_sizes[r]
+            if max_face is None:
+                # Row sizes given for some rows only: the remaining rows use the largest
+                max_face = max(size[1] for size in self.row_face_sizes)
+            min_face, max_face = self.scaled_size(min_face, scale), self.scaled_size(max_face, scale)
+            pad = max_face // 2
+
+            y1 = max(0, int(r * tile_h) - pad)
+            y2 = min(frame_h, int((r + 1) * tile_h) + pad)
+            for c in range(cols):
+                x1 = max(0, int(c * tile_w) - pad)
+                x2 = min(frame_w, int((c + 1) * tile_w) + pad)
+                tiles.append((x1, y1, x2, y2, min_face, max_face))
+
+        self._tile_cache = ((frame_w, frame_h, scale), tiles)
+        return tiles
+
+    def scaled_size(self, size, scale):
+        # The cascade window is 24x24, nothing smaller can be found
+        return max(24, int(size * scale))
+
+    def classifier(self):
+        if self.pool is None:
+            return self.detector
+        detector = getattr(self.local, "detector", None)
+        if detector is None:
+            detector = self.local.detector = cv2.CascadeClassifier(self.cascade_path)
+        return detector
+
+    def detect_rects(self, gray, min_face=None, max_face=None):
+        min_face = min_face or self.min_face
+        max_face = max_face or self.max_face or 0 # (0, 0) = no maxSize, as before tiling
+        rects = self.classifier().detectMultiScale(
+            gray, scaleFactor=1.1, minNeighbors=5,
+            minSize=(min_face, min_face), maxSize=(max_face, max_face),
+            flags=cv2.CASCADE_SCALE_IMAGE
+        )
+        if len(rects) == 0:
+            return np.zeros((0, 4), dtype=int)
+        return np.asarray(rects)
+
+    def detect_tiled(self, gray, scale=1.0):
+        """
+        Runs the cascade on every tile in the thread pool and merges
+        duplicate detections along the seams with NMS.
+        """
+        h, w = gray.shape[:2]
+
+        def run(tile):
+            x1, y1, x2, y2, min_face, max_face = tile
+            rects = self.detect_rects(gray[y1:y2, x1:x2], min_face, max_face)
+            if len(rects):
+                rects = rects + np.array([x1, y1, 0, 0])
+            return rects
+
+        results = [r for r in self.pool.map(run, self.get_tiles(w, h, scale)) if len(r)]
+        if not results:
+            return np.zeros((0, 4), dtype=int)
+
+        rects = np.concatenate(results)
+        boxes = np.column_stack([rects[:, :2], rects[:, :2] + rects[:, 2:]])
+        boxes = non_max_suppression(boxes, self.nms_overlap)
+        return np.column_stack([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]])
+
+    def process(self, frame, scale=1.0):
         """
         Process the frame and return face bounding box.
         Note: Landmarks are not available with Haar Cascade.
+        scale < 1 runs the cascade on a downscaled frame (boxes are
+        returned in full-frame coordinates).
         """
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # scaleFactor=1.1, minNeighbors=5, minSize=(30, 30)
-        rects = self.detector.detectMultiScale(
-            gray, scaleFactor=1.1, minNeighbors=5, minSize=(50, 50),
-            flags=cv2.CASCADE_SCALE_IMAGE
-        )
-        
+        if scale != 1.0:
+            gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+        if self.pool is not None:
+            rects = self.detect_tiled(gray, scale)
+        else:
+            # scaleFactor=1.1, minNeighbors=5, minSize=(50, 50)
+            max_face = self.scaled_size(self.max_face, scale) if self.max_face else None
+            rects = self.detect_rects(gray, self.scaled_size(self.min_face, scale), max_face)
+
+        if scale != 1.0 and len(rects):
+            rects = np.round(np.asarray(rects) / scale).astype(int)
+
         faces_data = []
         for (x, y, w, h) in rects:
+            x, y, w, h = int(x), int(y), int(w), int(h)
             bbox = (x, y, x + w, y + h) # x1, y1, x2, y2
-            
+
             # Simulated landmarks (Center, Top, Bottom, Left, Right)
             # strictly for visual placeholder, not accurate
             cx, cy = x + w//2, y + h//2
@@ -38,18 +160,33 @@ class FaceProcessor:
                 (x + w//4, y + 2*h//3), # Left Mouth approx
                 (x + 3*w//4, y + 2*h//3) # Right Mouth approx
             ]
-            
+
             faces_data.append({
-                "landmarks": landmarks_px, 
+                "landmarks": landmarks_px,
                 "landmarks_normalized": None,
+                "synthetic_landmarks": True, # Placeholders, useless for pose (see PoseEstimator)
                 "bbox": bbox
             })
-                
+
         return faces_data
-    
+
     def draw_landmarks(self, frame, faces_data):
         """Draws the box only."""
         for face in faces_data:
             x1, y1, x2, y2 = face["bbox"]
             cv2.rectangle(frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
         return frame
+
+    def scanned_area(self, frame_w, frame_h, scale=1.0):
+        """Pixels the tiles cover, relative to the frame (1.0 untiled)."""
+        if self.pool is None:
+            return 1.0
+        w, h = int(frame_w * scale), int(frame_h * scale)
+        tiles = self.get_tiles(w, h, scale)
+        return sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2, _, _ in tiles) / (w * h)
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+            cv2.setNumThreads(self.cv_threads)
@@ -0,0 +1,129 @@
+import cv2
+import hashlib
+import os
+import pickle
+import shutil
+import time
+import numpy as np
+from collections import OrderedDict
+
+class EmbeddingCache:
+    """
+    Content-addressed cache for deep model outputs (embeddings, attributes).
+    The key is an exact digest of the face crop shrunk to a fixed
+    `thumb_size` thumbnail, so the same image seen again (re-registration
+    on the same frame, byte-identical duplicates, retried requests) skips
+    inference while different faces never share a key. In-memory LRU bounded by `max_entries`,
+    entries expire after `ttl` seconds; `disk_dir` adds a second tier that
+    survives restarts.
+    Each namespace (e.g. "encode", "analyze") is bound to one model: asking
+    with a different model drops that namespace's entries.
+    """
+    def __init__(self, max_entries=1024, ttl=300.0, disk_dir=None, thumb_size=32):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self.thumb_size = thumb_size
+
+        self.entries = OrderedDict() # key -> (time, value), oldest first
+        self.models = {} # namespace -> model
+        self.thumb = np.zeros((thumb_size, thumb_size, 3), dtype=np.uint8)
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def key(self, namespace, model, face_img):
+        cv2.resize(face_img, (self.thumb_size, self.thumb_size), dst=self.thumb, interpolation=cv2.INTER_AREA)
+        h = hashlib.blake2b(self.thumb.tobytes(), digest_size=16)
+        h.update(f"{namespace}/{model}".encode())
+        return (namespace, h.hexdigest())
+
+    def _bind(self, namespace, model):
+        if self.models.get(namespace, model) != model:
+            self.invalidate(namespace)
+        self.models[namespace] = model
+
+    def invalidate(self, namespace=None):
+        """Drop all entries (memory and disk) of a namespace, or everything."""
+        for key in [k for k in self.entries if namespace is None or k[0] == namespace]:
+            del self.entries[key]
+        if self.disk_dir:
+            path = self.disk_dir if namespace is None else os.path.join(self.disk_dir, namespace)
+            shutil.rmtree(path, ignore_errors=True)
+        if namespace is None:
+            self.models.clear()
+        else:
+            self.models.pop(namespace, None)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key[0], key[1] + ".pkl")
+
+    def get(self, namespace, model, face_img, now=None):
+        """
+        Returns (value, key); value is None on a miss. Pass the key to put().
+        """
+        now = now or time.time()
+        self._bind(namespace, model)
+        key = self.key(namespace, model, face_img)
+
+        entry = self.entries.get(key)
+        if entry is not None:
+            if now - entry[0] <= self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self._copy(entry[1]), key
+            del self.entries[key]
+
+        if self.disk_dir:
+            path = self._disk_path(key)
+            try:
+                if now - os.path.getmtime(path) <= self.ttl:
+                    with open(path, "rb") as f:
+                        value = pickle.load(f)
+                    self._store(key, value, now)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return self._copy(value), key
+            except (OSError, pickle.UnpicklingError, EOFError):
+                pass
+
+        self.misses += 1
+        return None, key
+
+    def put(self, key, value, now=None):
+        if value is None:
+            return
+        self._store(key, value, now or time.time())
+        if self.disk_dir:
+            path = self._disk_path(key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path + ".tmp", "wb") as f:
+                pickle.dump(value, f)
+            os.replace(path + ".tmp", path)
+
+    def _store(self, key, value, now):
+        self.entries[key] = (now, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    @staticmethod
+    def _copy(value):
+        # Callers get their own copy, a cached value is never mutated in place
+        if isinstance(value, np.ndarray):
+            return value.copy()
+        if isinstance(value, dict):
+            return dict(value)
+        return value
+
+    def report(self):
+        return (f"Embedding cache: {self.hits} hits ({self.disk_hits} from disk), {self.misses} misses "
+                f"({self.hit_rate:.0%} hit rate), {len(self.entries)} entries")
@@ -41,61 +41,94 @@ def get_mar(mouth_points, landmarks):
     mar = (A + B + C) / (2.0 * D)
     return mar
 
-def get_head_pose(landmarks, frame_width, frame_height):
-    """
-    Estimate Head Pose (Pitch, Yaw, Roll) using PnP.
-    Uses standard 3D model points and 2D landmarks.
-    """
-    # 2D Image points from landmarks
-    # Nose tip, Chin, Left Eye Left Corner, Right Eye Right Corner, Left Mouth Corner, Right Mouth Corner
-    # Mediapipe indices: 1 (nose), 152 (chin), 33 (L eye), 263 (R eye), 61 (L mouth), 291 (R mouth)
-    
-    image_points = np.array([
-        landmarks[1],    # Nose tip
-        landmarks[152],  # Chin
-        landmarks[33],   # Left eye left corner
-        landmarks[263],  # Right eye right corner
-        landmarks[61],   # Left Mouth corner
-        landmarks[291]   # Right mouth corner
-    ], dtype="double")
-
-    # Standard 3D model points
-    model_points = np.array([
-        (0.0, 0.0, 0.0),             # Nose tip
-        (0.0, -330.0, -65.0),        # Chin
-        (-225.0, 170.0, -135.0),     # Left eye left corner
-        (225.0, 170.0, -135.0),      # Right eye right corner
-        (-150.0, -150.0, -125.0),    # Left Mouth corner
-        (150.0, -150.0, -125.0)      # Right mouth corner
-    ])
-
-    # Camera internals
+# Standard 3D model points for PnP (built once, not per call)
+# Nose tip, Chin, Left eye left corner, Right eye right corner, Left mouth corner, Right mouth corner
+HEAD_MODEL_POINTS = np.array([
+    (0.0, 0.0, 0.0),             # Nose tip
+    (0.0, -330.0, -65.0),        # Chin
+    (-225.0, 170.0, -135.0),     # Left eye left corner
+    (225.0, 170.0, -135.0),      # Right eye right corner
+    (-150.0, -150.0, -125.0),    # Left Mouth corner
+    (150.0, -150.0, -125.0)      # Right mouth corner
+])
+# Mediapipe indices: 1 (nose), 152 (chin), 33 (L eye), 263 (R eye), 61 (L mouth), 291 (R mouth)
+MEDIAPIPE_POSE_INDICES = [1, 152, 33, 263, 61, 291]
+NO_DISTORTION = np.zeros((4, 1)) # Assuming no lens distortion
+
+def camera_matrix(frame_width, frame_height):
+    """Approximate intrinsics: focal length = frame width, principal point at the centre."""
     focal_length = frame_width
     center = (frame_width / 2, frame_height / 2)
-    camera_matrix = np.array(
+    return np.array(
         [[focal_length, 0, center[0]],
          [0, focal_length, center[1]],
          [0, 0, 1]], dtype="double"
     )
-    dist_coeffs = np.zeros((4, 1)) # Assuming no lens distortion
+
+def get_head_pose(landmarks, frame_width, frame_height, cam_matrix=None):
+    """
+    Estimate Head Pose (Pitch, Yaw, Roll) using PnP.
+    Uses standard 3D model points and 2D landmarks: either the full
+    Mediapipe mesh or the six pose points in HEAD_MODEL_POINTS order.
+    Pass cam_matrix to reuse intrinsics across calls.
+    """
+    if len(landmarks) > max(MEDIAPIPE_POSE_INDICES):
+        image_points = np.array([landmarks[i] for i in MEDIAPIPE_POSE_INDICES], dtype="double")
+    else:
+        image_points = np.asarray(landmarks[:6], dtype="double")
+
+    if cam_matrix is None:
+        cam_matrix = camera_matrix(frame_width, frame_height)
 
     success, rotation_vector, translation_vector = cv2.solvePnP(
-        model_points, image_points, camera_matrix, dist_coeffs
+        HEAD_MODEL_POINTS, image_points, cam_matrix, NO_DISTORTION
     )
 
     if not success:
         return 0, 0, 0
 
-    # Project a 3D point (0, 0, 1000.0) onto the image plane to visualize
-    # (nose_end_point2D, jacobian) = cv2.projectPoints(np.array([(0.0, 0.0, 1000.0)]), rotation_vector, translation_vector, camera_matrix, dist_coeffs)
-
     # Calculate Euler angles
     rmat, jac = cv2.Rodrigues(rotation_vector)
-    angles, mtxR, mtxQ, Q, Qx, Qy, Qz = cv2.RQDecomp3x3(rmat)
+    angles = cv2.RQDecomp3x3(rmat)[0] # Return arity differs between OpenCV versions
 
-    # angles: (pitch, yaw, roll)
-    pitch = angles[0] * 360
-    yaw = angles[1] * 360
-    roll = angles[2] * 360
+    # angles: (pitch, yaw, roll) in degrees
+    pitch, yaw, roll = angles
+    # Model is y-up, the image y-down: a frontal face comes out near +-180 pitch
+    if pitch > 90:
+        pitch -= 180
+    elif pitch < -90:
+        pitch += 180
 
     return pitch, yaw, roll
+
+
+def non_max_suppression(boxes, overlap_thresh=0.3):
+    """
+    Vectorized Non-Maximum Suppression.
+    boxes: (N, 4) array of (x1, y1, x2, y2)
+    Returns the kept boxes, largest first.
+    Overlap is measured against the smaller box, so a face cut at a tile
+    seam is merged into the full detection from the neighbouring tile.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64)
+    if len(boxes) == 0:
+        return np.zeros((0, 4), dtype=int)
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    area = (x2 - x1) * (y2 - y1)
+    order = np.argsort(area)[::-1] # Largest first
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        # Intersection of box i with all remaining boxes at once
+        w = np.maximum(0, np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]))
+        h = np.maximum(0, np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]))
+        overlap = (w * h) / np.maximum(np.minimum(area[i], area[rest]), 1e-6)
+
+        order = rest[overlap <= overlap_thresh]
+
+    return boxes[keep].astype(int)
@@ -1,5 +1,7 @@
 import random
 import time
+import cv2
+import numpy as np
 
 class LivenessDetector:
     def __init__(self, ear_thresh=None, mar_thresh=None, head_turn_thresh=None, blink_consec_frames=None):
@@ -83,4 +85,124 @@ class LivenessDetector:
             self.challenge_completed = True
             return True, "PASSED"
         
-        return False, "WAITING..."
\ No newline at end of file
+        return False, "WAITING..."
+
+class PassiveLivenessDetector:
+    """
+    Passive liveness from per-track ROI statistics over the last `window` frames:
+      - micro-motion: mean change of the normalized face thumbnail between frames
+        after registering it onto the previous one with an affine fit, so only
+        non-rigid change counts (blinks, expressions; a photo only moves rigidly)
+      - texture: Laplacian energy relative to contrast (prints and screens lose fine detail)
+      - jitter: spread of the box centre relative to face width (natural sway)
+    All state lives in ring buffers preallocated for `capacity` track slots
+    (the TrackStateStore slot index), nothing is allocated per frame.
+    decide() returns "LIVE" when every cue is confidently live, "SPOOF" when
+    the face is suspiciously static, "UNCERTAIN" otherwise and "PENDING"
+    until the window is full. Only LIVE lets a track skip the active challenge.
+    """
+    def __init__(self, capacity=256, window=15, roi_size=32, motion_min=0.02,
+                 texture_min=0.15, jitter_min=0.004):
+        self.capacity = capacity
+        self.window = window
+        self.roi_size = roi_size
+        self.motion_min = motion_min
+        self.texture_min = texture_min
+        self.jitter_min = jitter_min
+
+        s = roi_size
+        self.prev_roi = np.zeros((capacity, s, s), dtype=np.float32)
+        self.motion = np.zeros((capacity, window), dtype=np.float32)
+        self.texture = np.zeros((capacity, window), dtype=np.float32)
+        self.centers = np.zeros((capacity, window, 2), dtype=np.float32)
+        self.count = np.zeros(capacity, dtype=np.int32)
+
+        # Scratch buffers reused for every face
+        self._bgr = np.zeros((s, s, 3), dtype=np.uint8)
+        self._gray = np.zeros((s, s), dtype=np.uint8)
+        self._roi = np.zeros((s, s), dtype=np.float32)
+        self._lap = np.zeros((s, s), dtype=np.float32)
+        self._aligned = np.zeros((s, s), dtype=np.float32)
+        self._warp = np.eye(2, 3, dtype=np.float32)
+        self._identity = np.eye(2, 3, dtype=np.float32)
+        self._criteria = (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 30, 1e-4)
+        self.margin = max(2, roi_size // 8) # border left out of the residual (warp edge effects)
+        self._diff = np.zeros((s - 2 * self.margin, s - 2 * self.margin), dtype=np.float32)
+
+    def reset(self, slot):
+        self.count[slot] = 0
+
+    def update(self, slot, frame, bbox):
+        x1, y1, x2, y2 = bbox
+        h, w = frame.shape[:2]
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        face_img = frame[y1:y2, x1:x2]
+        if face_img.size == 0:
+            return
+
+        cv2.resize(face_img, (self.roi_size, self.roi_size), dst=self._bgr, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self._bgr, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        np.multiply(self._gray, 1.0 / 255.0, out=self._roi, casting='unsafe')
+
+        # Normalize brightness and contrast so lighting changes are not motion
+        mean, std = cv2.meanStdDev(self._roi)
+        mean, std = float(mean[0, 0]), float(std[0, 0])
+        self._roi -= mean
+        self._roi /= max(std, 1e-3)
+
+        i = self.count[slot] % self.window
+        n = self.count[slot]
+
+        cv2.Laplacian(self._roi, cv2.CV_32F, dst=self._lap)
+        self.texture[slot, i] = cv2.meanStdDev(self._lap)[1][0, 0] ** 2 * std
+
+        width = max(x2 - x1, 1)
+        self.centers[slot, i, 0] = (x1 + x2) / (2.0 * width)
+        self.centers[slot, i, 1] = (y1 + y2) / (2.0 * width)
+
+        if n > 0:
+            self.motion[slot, i] = self.residual(self.prev_roi[slot], self._roi) * std
+        self.prev_roi[slot] = self._roi
+        self.count[slot] = n + 1
+
+    def residual(self, prev, roi):
+        """
+        Mean absolute difference left after aligning roi onto prev with an
+        affine transform (translation, scale, small rotation / tilt): shaking
+        or zooming a flat photo is explained by the fit, a blink is not.
+        """
+        self._warp[:] = self._identity
+        try:
+            _, warp = cv2.findTransformECC(prev, roi, self._warp, cv2.MOTION_AFFINE, self._criteria, None, 1)
+        except cv2.error:
+            # No convergence (e.g. flat ROI): fall back to translation only
+            (dx, dy), _ = cv2.phaseCorrelate(prev, roi)
+            warp = self._warp
+            warp[0, 2], warp[1, 2] = dx, dy
+        cv2.warpAffine(roi, warp, (self.roi_size, self.roi_size), dst=self._aligned,
+                       flags=cv2.INTER_LINEAR + cv2.WARP_INVERSE_MAP, borderMode=cv2.BORDER_REPLICATE)
+        m = self.margin
+        cv2.absdiff(self._aligned[m:-m, m:-m], prev[m:-m, m:-m], dst=self._diff)
+        return cv2.mean(self._diff)[0]
+
+    def scores(self, slot):
+        """(micro_motion, texture, jitter) over the current window."""
+        n = min(self.count[slot], self.window)
+        if n < 2:
+            return 0.0, 0.0, 0.0
+        motion = self.motion[slot, :n]
+        if self.count[slot] <= self.window:
+            motion = self.motion[slot, 1:n] # First sample has no predecessor
+        jitter = self.centers[slot, :n].std(axis=0).max()
+        return float(np.median(motion)), float(np.median(self.texture[slot, :n])), float(jitter)
+
+    def decide(self, slot):
+        if self.count[slot] < self.window:
+            return "PENDING"
+        motion, texture, jitter = self.scores(slot)
+        if motion >= self.motion_min and texture >= self.texture_min and jitter >= self.jitter_min:
+            return "LIVE"
+        if motion < self.motion_min / 2 and jitter < self.jitter_min / 2:
+            return "SPOOF"
+        return "UNCERTAIN"
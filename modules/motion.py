@@ -0,0 +1,112 @@
+import cv2
+import numpy as np
+import time
+
+class MotionGate:
+    """
+    Decides whether face detection needs to run on a frame.
+    Works on a tiny grayscale thumbnail: a running-average background is
+    updated incrementally and the fraction of pixels that differ from it
+    is the motion score. While the scene is static and nothing is tracked,
+    detection is suspended (or run every `idle_detect_interval` frames);
+    the first frame with motion goes straight back to full detection.
+    """
+    def __init__(self, size=(64, 36), alpha=0.05, pixel_threshold=25, min_fraction=0.005,
+                 idle_after=30, idle_detect_interval=15):
+        self.size = size
+        self.alpha = alpha
+        self.pixel_threshold = pixel_threshold
+        self.min_fraction = min_fraction
+        self.idle_after = idle_after # Static frames before going idle
+        self.idle_detect_interval = idle_detect_interval # 0 = no detection while idle
+
+        # Preallocated thumbnails, nothing is allocated per frame
+        self.background = None
+        self.thumb = np.zeros((size[1], size[0], 3), dtype=np.uint8)
+        self.small = np.zeros((size[1], size[0]), dtype=np.uint8)
+        self.background_u8 = np.zeros((size[1], size[0]), dtype=np.uint8)
+        self.diff = np.zeros((size[1], size[0]), dtype=np.uint8)
+        self.static_frames = 0
+        self.idle = False
+        self.woke = False # True on the first frame after idle
+        self.motion_fraction = 0.0
+
+        # Stats
+        self.idle_frames = 0
+        self.active_frames = 0
+        self.wakeups = 0
+        self.wake_latencies = []
+        self._wake_time = None
+        self._frame_time = None
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        self.cpu_time = {True: 0.0, False: 0.0} # keyed by idle
+        self.wall_time = {True: 0.0, False: 0.0}
+
+    def update(self, frame):
+        """
+        Feed a frame. Returns True if there is motion.
+        """
+        self._account()
+        self._frame_time = time.perf_counter()
+        cv2.resize(frame, self.size, dst=self.thumb, interpolation=cv2.INTER_AREA)
+        cv2.cvtColor(self.thumb, cv2.COLOR_BGR2GRAY, dst=self.small)
+
+        if self.background is None:
+            self.background = self.small.astype(np.float32)
+            return True
+
+        cv2.convertScaleAbs(self.background, dst=self.background_u8)
+        cv2.absdiff(self.small, self.background_u8, dst=self.diff)
+        self.motion_fraction = np.count_nonzero(self.diff > self.pixel_threshold) / self.diff.size
+        cv2.accumulateWeighted(self.small, self.background, self.alpha)
+
+        motion = self.motion_fraction >= self.min_fraction
+        self.static_frames = 0 if motion else self.static_frames + 1
+        return motion
+
+    def should_detect(self, motion, active_tracks, frame_index):
+        """
+        True if detection should run on this frame.
+        """
+        was_idle = self.idle
+        self.idle = not motion and active_tracks == 0 and self.static_frames >= self.idle_after
+
+        self.woke = was_idle and not self.idle
+        if self.woke:
+            self.wakeups += 1
+            self._wake_time = self._frame_time
+
+        if self.idle:
+            self.idle_frames += 1
+            if self.idle_detect_interval:
+                return frame_index % self.idle_detect_interval == 0
+            return False
+
+        self.active_frames += 1
+        return True
+
+    def detection_done(self):
+        """Call after detection; records wake-up latency (frame in -> detection out) after idle."""
+        if self._wake_time is not None:
+            self.wake_latencies.append(time.perf_counter() - self._wake_time)
+            self._wake_time = None
+
+    def _account(self):
+        # Attribute CPU / wall time since the last frame to the state we were in
+        cpu, wall = time.process_time(), time.perf_counter()
+        self.cpu_time[self.idle] += cpu - self._cpu
+        self.wall_time[self.idle] += wall - self._wall
+        self._cpu, self._wall = cpu, wall
+
+    def cpu_percent(self, idle=True):
+        """Process CPU usage (% of one core) while idle / active."""
+        wall = self.wall_time[idle]
+        return 100.0 * self.cpu_time[idle] / wall if wall > 0 else 0.0
+
+    def report(self):
+        total = self.idle_frames + self.active_frames
+        latency = np.mean(self.wake_latencies) * 1000 if self.wake_latencies else 0.0
+        return (f"Motion gate: idle {self.idle_frames}/{total} frames, "
+                f"CPU idle {self.cpu_percent(True):.0f}% vs active {self.cpu_percent(False):.0f}%, "
+                f"{self.wakeups} wake-ups (mean {latency:.1f} ms to first detection)")
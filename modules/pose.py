@@ -0,0 +1,104 @@
+import cv2
+import numpy as np
+from .geometry import get_head_pose, camera_matrix
+
+# Proxy calibration from `python benchmark.py pose` (Haar boxes on rendered heads)
+YAW_GAIN = 140.3
+PITCH_GAIN = 431.5
+PITCH_CENTRE = 0.481
+
+class PoseEstimator:
+    """
+    Head pose (pitch, yaw, roll) in degrees for every face of a frame in one call.
+    Faces with real landmarks go through PnP against the shared 3D model,
+    with the camera matrix cached per frame size. Haar-only faces use a
+    cheap proxy computed on all of them at once: each face is shrunk to a
+    `size` x `size` grayscale patch and, on log intensity (so a lighting
+    gradient across the face is not mistaken for a turn),
+      yaw   ~ left/right imbalance of gradient energy (a turned head shows
+              one cheek and the hairline / ear on one side),
+      pitch ~ vertical offset of the gradient centroid from where eyes,
+              brows and mouth put it on a frontal face.
+    Roll is 0 for the proxy; the frontal Haar cascade only fires on
+    upright faces anyway.
+    The gains are fitted on rendered heads at known angles with
+    `python benchmark.py pose` (about 6 degrees RMS yaw error).
+    """
+    def __init__(self, size=32, yaw_gain=YAW_GAIN, pitch_gain=PITCH_GAIN, pitch_centre=PITCH_CENTRE):
+        self.size = size
+        self.yaw_gain = yaw_gain
+        self.pitch_gain = pitch_gain
+        self.pitch_centre = pitch_centre
+        self.cameras = {} # (w, h) -> camera matrix
+
+        # Reused across frames, grown when a frame has more faces
+        self.patch = np.zeros((size, size, 3), dtype=np.uint8)
+        self.stack = np.zeros((0, size, size), dtype=np.uint8)
+        rows = (np.arange(size - 2) + 1.0) / size
+        self.row_pos = rows[None, :, None] # vertical position of each gradient row, 0 = top
+        self.log_table = np.log1p(np.arange(256)).astype(np.float32)
+
+    def camera(self, frame_width, frame_height):
+        key = (frame_width, frame_height)
+        matrix = self.cameras.get(key)
+        if matrix is None:
+            matrix = self.cameras[key] = camera_matrix(frame_width, frame_height)
+        return matrix
+
+    @staticmethod
+    def has_landmarks(face_data):
+        # The Haar detector only fills in placeholder points derived from the box
+        return bool(face_data.get('landmarks')) and not face_data.get('synthetic_landmarks')
+
+    def estimate(self, frame, faces_data):
+        """
+        Returns an (N, 3) array of (pitch, yaw, roll), one row per face.
+        """
+        h, w = frame.shape[:2]
+        poses = np.zeros((len(faces_data), 3))
+
+        proxy = []
+        for i, face in enumerate(faces_data):
+            if self.has_landmarks(face):
+                poses[i] = get_head_pose(face['landmarks'], w, h, self.camera(w, h))
+            else:
+                proxy.append(i)
+
+        if proxy:
+            poses[proxy, :2] = self.proxy(frame, [faces_data[i]['bbox'] for i in proxy])
+        return poses
+
+    def proxy(self, frame, bboxes):
+        """(N, 2) array of approximate (pitch, yaw) from face boxes."""
+        h, w = frame.shape[:2]
+        n = len(bboxes)
+        if len(self.stack) < n:
+            self.stack = np.zeros((n, self.size, self.size), dtype=np.uint8)
+
+        valid = np.ones(n, dtype=bool)
+        for i, (x1, y1, x2, y2) in enumerate(bboxes):
+            x1, y1, x2, y2 = max(0, x1), max(0, y1), min(w, x2), min(h, y2)
+            if x2 <= x1 or y2 <= y1:
+                valid[i] = False
+                continue
+            cv2.resize(frame[y1:y2, x1:x2], (self.size, self.size), dst=self.patch, interpolation=cv2.INTER_AREA)
+            cv2.cvtColor(self.patch, cv2.COLOR_BGR2GRAY, dst=self.stack[i])
+
+        # Everything below is vectorized over all faces
+        faces = self.log_table[self.stack[:n]]
+        gx = np.abs(faces[:, 1:-1, 2:] - faces[:, 1:-1, :-2])
+        gy = np.abs(faces[:, 2:, 1:-1] - faces[:, :-2, 1:-1])
+        energy = gx + gy
+        total = energy.sum(axis=(1, 2)) + 1e-6
+
+        half = energy.shape[2] // 2
+        left = energy[:, :, :half].sum(axis=(1, 2))
+        right = energy[:, :, -half:].sum(axis=(1, 2))
+        yaw = self.yaw_gain * (right - left) / total
+
+        centroid = (energy * self.row_pos).sum(axis=(1, 2)) / total
+        pitch = self.pitch_gain * (self.pitch_centre - centroid)
+
+        result = np.column_stack([pitch, yaw])
+        result[~valid] = 0.0
+        return result
@@ -0,0 +1,63 @@
+import cv2
+import numpy as np
+
+class FacePreprocessor:
+    """
+    Crops and resizes each face once per frame for every deep model.
+    Recognition and attribute analysis both ask for the same face on the
+    same frame; the first request clamps the box and resizes the crop
+    into a preallocated buffer, later requests for that face and size get
+    the same buffer. Buffers are reused on the next frame, so callers must
+    not hold on to a crop.
+    """
+    def __init__(self, max_faces=32):
+        self.max_faces = max_faces
+        self.frame = None # Crops are only valid for this frame
+        self.slots = {} # (bbox, size) -> buffer index
+        self.used = {} # size -> crops made this frame
+        self.buffers = {} # size -> [HxWx3 uint8 buffers]
+        self.hits = 0
+        self.crops = 0
+
+    def _buffer(self, size, index):
+        pool = self.buffers.setdefault(size, [])
+        while len(pool) <= index:
+            pool.append(np.zeros((size, size, 3), dtype=np.uint8))
+        return pool[index]
+
+    def crop(self, frame, bbox, size):
+        """
+        size x size BGR crop of the face box, or None if the box is empty.
+        """
+        if frame is not self.frame:
+            # New frame: forget the previous crops, keep the buffers
+            self.frame = frame
+            self.slots = {}
+            self.used = {}
+
+        key = (tuple(int(v) for v in bbox), size)
+        index = self.slots.get(key)
+        if index is not None:
+            self.hits += 1
+            return self._buffer(size, index)
+
+        x1, y1, x2, y2 = key[0]
+        h, w = frame.shape[:2]
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        if x2 <= x1 or y2 <= y1:
+            return None
+
+        # Past max_faces the oldest buffers of this frame are recycled
+        count = self.used.get(size, 0)
+        self.used[size] = count + 1
+        index = count % self.max_faces
+        if count >= self.max_faces:
+            self.slots = {k: i for k, i in self.slots.items() if (k[1], i) != (size, index)}
+
+        buffer = self._buffer(size, index)
+        interpolation = cv2.INTER_AREA if x2 - x1 > size else cv2.INTER_LINEAR
+        cv2.resize(frame[y1:y2, x1:x2], (size, size), dst=buffer, interpolation=interpolation)
+        self.slots[key] = index
+        self.crops += 1
+        return buffer
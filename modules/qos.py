@@ -0,0 +1,124 @@
+import time
+from contextlib import contextmanager
+
+# Degradation ladder, cheapest last.
+# detect_scale: downscale factor applied before Haar detection
+# detect_interval: run detection every N frames (tracks coast in between)
+# run_analysis: whether age/gender/emotion analysis runs at all
+# max_recognitions: DeepFace encodes allowed per frame (None = unlimited)
+LEVELS = [
+    {"name": "FULL", "detect_scale": 1.0, "detect_interval": 1, "run_analysis": True, "max_recognitions": None},
+    {"name": "LIGHT", "detect_scale": 0.75, "detect_interval": 1, "run_analysis": True, "max_recognitions": 2},
+    {"name": "REDUCED", "detect_scale": 0.5, "detect_interval": 2, "run_analysis": True, "max_recognitions": 1},
+    {"name": "LOW", "detect_scale": 0.5, "detect_interval": 3, "run_analysis": False, "max_recognitions": 1},
+    {"name": "MINIMAL", "detect_scale": 0.4, "detect_interval": 4, "run_analysis": False, "max_recognitions": 1},
+]
+
+class QoSController:
+    """
+    Holds the frame rate near `target_fps` by stepping through LEVELS.
+    Frame and stage times are smoothed with an EMA. The level only drops
+    after `degrade_frames` consecutive slow frames and only recovers after
+    `upgrade_frames` consecutive fast ones, so it does not oscillate.
+    """
+    def __init__(self, target_fps=30, enabled=True, degrade_margin=1.1, upgrade_margin=0.7,
+                 degrade_frames=5, upgrade_frames=45, alpha=0.2):
+        self.budget = 1.0 / target_fps
+        self.enabled = enabled
+        self.degrade_margin = degrade_margin
+        self.upgrade_margin = upgrade_margin
+        self.degrade_frames = degrade_frames
+        self.upgrade_frames = upgrade_frames
+        self.alpha = alpha
+
+        self.level = 0
+        self.frame_time = self.budget
+        self.stage_times = {} # EMA per stage (seconds)
+        self.current = {} # Accumulated this frame
+        self.frame_start = None
+        self.slow_count = 0
+        self.fast_count = 0
+
+    @property
+    def settings(self):
+        return LEVELS[self.level]
+
+    @property
+    def detect_scale(self):
+        return self.settings["detect_scale"]
+
+    @property
+    def detect_interval(self):
+        return self.settings["detect_interval"]
+
+    @property
+    def run_analysis(self):
+        return self.settings["run_analysis"]
+
+    @property
+    def max_recognitions(self):
+        return self.settings["max_recognitions"]
+
+    def start_frame(self):
+        self.frame_start = time.perf_counter()
+        self.current = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] = self.current.get(name, 0.0) + time.perf_counter() - start
+
+    def end_frame(self):
+        if self.frame_start is None:
+            return
+        elapsed = time.perf_counter() - self.frame_start
+        self.frame_time += self.alpha * (elapsed - self.frame_time)
+        for name in set(self.stage_times) | set(self.current):
+            prev = self.stage_times.get(name, 0.0)
+            self.stage_times[name] = prev + self.alpha * (self.current.get(name, 0.0) - prev)
+
+        if self.enabled:
+            self._adjust()
+
+    def idle(self):
+        """
+        Called on frames the loop paces itself (nothing to process): the
+        frame is left out of the timing and the level returns to FULL, so
+        the first detection after wake-up runs at full quality.
+        """
+        self.frame_start = None
+        self.level = 0
+        self.frame_time = self.budget * self.upgrade_margin
+        self.slow_count = 0
+        self.fast_count = 0
+
+    def _adjust(self):
+        if self.frame_time > self.budget * self.degrade_margin:
+            self.slow_count += 1
+            self.fast_count = 0
+        elif self.frame_time < self.budget * self.upgrade_margin:
+            self.fast_count += 1
+            self.slow_count = 0
+        else:
+            self.slow_count = 0
+            self.fast_count = 0
+
+        if self.slow_count >= self.degrade_frames and self.level < len(LEVELS) - 1:
+            self.level += 1
+            self.slow_count = 0
+        elif self.fast_count >= self.upgrade_frames and self.level > 0:
+            self.level -= 1
+            self.fast_count = 0
+
+    def status(self):
+        """Short string for the dashboard."""
+        return f"L{self.level} {self.settings['name']}"
+
+    def slowest_stage(self):
+        if not self.stage_times:
+            return None, 0.0
+        name = max(self.stage_times, key=self.stage_times.get)
+        return name, self.stage_times[name]
@@ -1,16 +1,18 @@
 import cv2
 import numpy as np
-from .geometry import get_head_pose
+from .pose import PoseEstimator
 
 class QualityChecker:
     def __init__(self, blur_threshold=50, min_brightness=70, max_brightness=220, 
-                 max_yaw=25, max_pitch=25, min_face_width=80):
+                 max_yaw=25, max_pitch=25, min_face_width=80, gate_proxy_pose=True):
         self.blur_threshold = blur_threshold
         self.min_brightness = min_brightness
         self.max_brightness = max_brightness
         self.max_yaw = max_yaw
         self.max_pitch = max_pitch
         self.min_face_width = min_face_width
+        self.gate_proxy_pose = gate_proxy_pose # False: proxy poses are shown but never reject
+        self.pose_estimator = PoseEstimator()
 
     def check_blur(self, frame):
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
@@ -22,13 +24,26 @@ class QualityChecker:
         brightness = np.mean(hsv[:, :, 2])
         return brightness, (self.min_brightness <= brightness <= self.max_brightness)
 
-    def check_pose(self, landmarks, frame_width, frame_height):
-        # MediaPipe missing, so we cannot accurately calculate pitch/yaw/roll from 2D Haar bbox easily without PnP.
-        # We will assume pose is OK if face is detected for now, or use Aspect Ratio.
-        # Future: Use DeepFace.analyze['region'] to check centering?
-        
-        # Dummy Return: (pitch, yaw, roll), is_good
-        return (0, 0, 0), True
+    def estimate_poses(self, frame, faces_data):
+        """
+        Head pose for all faces of a frame in one batched call; stored as
+        face_data['pose'] so evaluate() doesn't redo it per face.
+        """
+        poses = self.pose_estimator.estimate(frame, faces_data)
+        for face_data, pose in zip(faces_data, poses):
+            face_data['pose'] = tuple(float(v) for v in pose)
+            face_data['pose_proxy'] = not self.pose_estimator.has_landmarks(face_data)
+
+    def check_pose(self, frame, face_data):
+        # PnP when real landmarks exist, otherwise a gradient-asymmetry proxy on the box
+        pose = face_data.get('pose')
+        if pose is None:
+            self.estimate_poses(frame, [face_data])
+            pose = face_data['pose']
+        if face_data.get('pose_proxy') and not self.gate_proxy_pose:
+            return pose, True
+        pitch, yaw, roll = pose
+        return pose, abs(pitch) <= self.max_pitch and abs(yaw) <= self.max_yaw
 
     def check_face_size(self, bbox):
         # bbox is (x1, y1, x2, y2)
@@ -56,7 +71,7 @@ class QualityChecker:
              blur_score, is_clear = self.check_blur(face_roi)
              brightness, is_lit = self.check_brightness(face_roi)
 
-        pose, is_frontal = self.check_pose(face_data['landmarks'], w, h)
+        pose, is_frontal = self.check_pose(frame, face_data)
         width, is_large_enough = self.check_face_size(bbox)
         
         status = is_clear and is_lit and is_frontal and is_large_enough
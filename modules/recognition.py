@@ -1,32 +1,70 @@
+import time
 import numpy as np
-try:
-    from deepface import DeepFace
-except ImportError:
-    print("Warning: DeepFace not installed. Recognition will fail.")
-    DeepFace = None
+
+_DeepFace = None # Imported on first use, see load_deepface()
+
+def load_deepface():
+    """
+    DeepFace module, or None if it is not installed.
+    Not imported at module level: spawned processes (shard workers) re-run
+    main.py's imports and must not load TensorFlow.
+    """
+    global _DeepFace
+    if _DeepFace is None:
+        try:
+            from deepface import DeepFace
+        except ImportError:
+            print("Warning: DeepFace not installed. Recognition and attribute analysis will fail.")
+            DeepFace = False
+        _DeepFace = DeepFace
+    return _DeepFace or None
+
+# Square input size of each DeepFace recognition model; crops are made at
+# this size up front so DeepFace's own resize is a no-op
+MODEL_INPUT_SIZES = {
+    "VGG-Face": 224, "Facenet": 160, "Facenet512": 160, "OpenFace": 96,
+    "DeepFace": 152, "ArcFace": 112, "Dlib": 150, "SFace": 112, "GhostFaceNet": 112
+}
 
 class FaceRecognizer:
-    def __init__(self, match_threshold=0.4):
+    def __init__(self, match_threshold=0.4, model_name="VGG-Face", cache=None, preprocessor=None, db=None):
         # VGG-Face with Cosine Similarity usually uses threshold around 0.40
         self.match_threshold = match_threshold
-        self.model_name = "VGG-Face"
+        self.model_name = model_name
+        self.cache = cache # Optional EmbeddingCache, keyed by crop content
+        self.preprocessor = preprocessor # Optional FacePreprocessor shared with FaceAnalyzer
+        self.db = db # Optional Database, for verify() by user ID
+
+    def crop(self, frame, bbox):
+        size = MODEL_INPUT_SIZES.get(self.model_name)
+        if self.preprocessor is not None and size:
+            return self.preprocessor.crop(frame, bbox, size)
+
+        x1, y1, x2, y2 = bbox
+        h, w, _ = frame.shape
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        
+        face_img = frame[y1:y2, x1:x2]
+        return face_img if face_img.size else None
 
     def encode(self, frame, bbox):
         """
         Generates embedding for the face using DeepFace.
         bbox is (x1, y1, x2, y2).
         """
+        DeepFace = load_deepface()
         if DeepFace is None:
             return None
 
-        x1, y1, x2, y2 = bbox
-        h, w, _ = frame.shape
-        x1, y1 = max(0, x1), max(0, y1)
-        x2, y2 = min(w, x2), min(h, y2)
-        
-        face_img = frame[y1:y2, x1:x2]
-        if face_img.size == 0:
+        face_img = self.crop(frame, bbox)
+        if face_img is None:
             return None
+
+        if self.cache is not None:
+            embedding, key = self.cache.get("encode", self.model_name, face_img)
+            if embedding is not None:
+                return embedding
             
         try:
             # represent returns a list of dicts
@@ -38,7 +76,10 @@ class FaceRecognizer:
             )
             
             if embedding_objs:
-                return np.array(embedding_objs[0]["embedding"])
+                embedding = np.array(embedding_objs[0]["embedding"])
+                if self.cache is not None:
+                    self.cache.put(key, embedding)
+                return embedding
         except Exception as e:
             print(f"Encoding error: {e}")
         
@@ -85,4 +126,107 @@ class FaceRecognizer:
             confidence = max(0.0, 1.0 - min_dist)
             return db_ids[best_match_idx], db_names[best_match_idx], min_dist, confidence
         
-        return None, "Unknown", min_dist, 0.0
\ No newline at end of file
+        return None, "Unknown", min_dist, 0.0
+
+    def verify(self, embedding, user_id, threshold=None):
+        """
+        1:1 check of an embedding against one enrolled user, through the
+        Database template index. Returns (is_match, distance, confidence);
+        distance is to the closest template even when it doesn't match.
+        Cost is independent of gallery size.
+        """
+        templates = self.db.get_templates(user_id) if self.db is not None else None
+        return self.verify_templates(embedding, templates, threshold)
+
+    def verify_templates(self, embedding, templates, threshold=None):
+        """
+        1:1 check against an (N, D) matrix of unit-norm template rows
+        (Database.get_templates, or a re-ID track's cached embedding).
+        """
+        threshold = self.match_threshold if threshold is None else threshold
+        if embedding is None or templates is None or len(templates) == 0:
+            return False, 1.0, 0.0
+
+        a = np.asarray(embedding, dtype=np.float32).ravel()
+        norm_a = np.linalg.norm(a)
+        if norm_a == 0:
+            return False, 1.0, 0.0
+
+        dist = float(1.0 - np.max(templates @ (a / norm_a))) # Cosine Distance to the closest template
+        if dist < threshold:
+            return True, dist, max(0.0, 1.0 - dist)
+        return False, dist, 0.0
+
+class CascadeRecognizer:
+    """
+    Two-stage recognition. A cheap LBP descriptor is computed for every face
+    and compared against the descriptor gallery first:
+      - nothing enrolled, or every descriptor is far away -> Unknown, no deep inference
+      - otherwise the deep embedding is matched only against the closest
+        `shortlist_size` users (plus users that have no descriptor yet).
+    shortlist_size=None / reject_distance=None disable either stage.
+    """
+    def __init__(self, recognizer, descriptor, shortlist_size=5, reject_distance=0.9):
+        self.recognizer = recognizer
+        self.descriptor = descriptor
+        self.shortlist_size = shortlist_size
+        self.reject_distance = reject_distance
+
+        self.faces = 0
+        self.deep_calls = 0
+
+    @property
+    def avoided_fraction(self):
+        """Fraction of faces that did not need a deep inference."""
+        if self.faces == 0:
+            return 0.0
+        return 1.0 - self.deep_calls / self.faces
+
+    def shortlist(self, descriptor, db_descriptors):
+        """
+        Returns gallery indices worth a deep comparison, or [] to reject.
+        """
+        known = [i for i, d in enumerate(db_descriptors) if d is not None]
+        unknown = [i for i, d in enumerate(db_descriptors) if d is None]
+        if descriptor is None or not known:
+            return known + unknown
+
+        dists = self.descriptor.distances(descriptor, np.stack([db_descriptors[i] for i in known]))
+        order = np.argsort(dists)
+        if self.shortlist_size is not None:
+            order = order[:self.shortlist_size]
+        if self.reject_distance is not None:
+            order = [i for i in order if dists[i] <= self.reject_distance]
+        return [known[i] for i in order] + unknown
+
+    def recognize(self, frame, bbox, db_embeddings, db_ids, db_names, db_descriptors, spans=None):
+        """
+        Returns (user_id, name, distance, confidence, embedding, descriptor).
+        embedding is None when the deep model was skipped (an LBP reject;
+        callers should see several in a row before denying).
+        Returns None if the deep encoding failed (try again on a later frame).
+        If `spans` is a dict, encode_start / encode_end wall times are stored in it.
+        """
+        self.faces += 1
+        descriptor = self.descriptor.compute(frame, bbox)
+
+        candidates = self.shortlist(descriptor, db_descriptors)
+        if not candidates:
+            return None, "Unknown", 1.0, 0.0, None, descriptor
+
+        self.deep_calls += 1
+        if spans is not None:
+            spans["encode_start"] = time.time()
+        emb = self.recognizer.encode(frame, bbox)
+        if spans is not None:
+            spans["encode_end"] = time.time()
+        if emb is None:
+            return None
+
+        uid, name, dist, conf = self.recognizer.identify(
+            emb,
+            [db_embeddings[i] for i in candidates],
+            [db_ids[i] for i in candidates],
+            [db_names[i] for i in candidates]
+        )
+        return uid, name, dist, conf, emb, descriptor
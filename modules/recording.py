@@ -0,0 +1,234 @@
+import cv2
+import json
+import os
+import queue
+import threading
+import time
+import numpy as np
+
+class SessionRecorder:
+    """
+    Records the frames a camera delivers, with their capture timestamps,
+    so a site session can be replayed in the lab (see ReplayCamera).
+    write() only copies the frame into a queue; a background thread
+    encodes frames (JPEG by default, ".png" for bit-exact frames) and
+    writes them in chunks of `chunk_frames` to chunk_NNNNN.npz, listed in
+    index.json. When the queue is full frames are dropped and counted
+    rather than blocking the frame loop.
+    """
+    def __init__(self, session_dir, chunk_frames=150, queue_size=120, codec=".jpg", quality=95):
+        self.session_dir = session_dir
+        self.chunk_frames = chunk_frames
+        self.codec = codec
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality] if codec == ".jpg" else [cv2.IMWRITE_PNG_COMPRESSION, 1]
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.index = {"codec": codec, "frames": 0, "chunks": []}
+        self.buffer = [] # encoded frames of the open chunk
+        self.timestamps = []
+        self.recorded = 0
+        self.dropped = 0
+        self.encode_time = 0.0
+
+        self.started = False
+        self.thread = None
+
+    def start(self):
+        if self.started:
+            return self
+        os.makedirs(self.session_dir, exist_ok=True)
+        self.started = True
+        self.thread = threading.Thread(target=self.update, args=())
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def write(self, frame, timestamp=None):
+        """
+        Queue a frame. Never blocks.
+        """
+        try:
+            self.queue.put_nowait((frame.copy(), timestamp if timestamp is not None else time.time()))
+        except queue.Full:
+            self.dropped += 1
+
+    def update(self):
+        while self.started or not self.queue.empty():
+            try:
+                frame, timestamp = self.queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            t0 = time.perf_counter()
+            ok, data = cv2.imencode(self.codec, frame, self.params)
+            self.encode_time += time.perf_counter() - t0
+            if not ok:
+                self.dropped += 1
+                continue
+
+            self.buffer.append(data.ravel())
+            self.timestamps.append(timestamp)
+            self.recorded += 1
+            if len(self.buffer) >= self.chunk_frames:
+                self._flush()
+        self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        name = f"chunk_{len(self.index['chunks']):05d}.npz"
+        path = os.path.join(self.session_dir, name)
+        # Payload is already compressed by the codec; write then rename
+        np.savez(path + ".tmp.npz",
+                 data=np.concatenate(self.buffer),
+                 offsets=np.cumsum([0] + [len(b) for b in self.buffer]),
+                 timestamps=np.array(self.timestamps))
+        os.replace(path + ".tmp.npz", path)
+
+        self.index["chunks"].append({
+            "name": name, "count": len(self.buffer),
+            "first_ts": self.timestamps[0], "last_ts": self.timestamps[-1]
+        })
+        self.index["frames"] += len(self.buffer)
+        index_path = os.path.join(self.session_dir, "index.json")
+        with open(index_path + ".tmp", "w") as f:
+            json.dump(self.index, f, indent=4)
+        os.replace(index_path + ".tmp", index_path)
+
+        self.buffer = []
+        self.timestamps = []
+
+    def stop(self):
+        if not self.started:
+            return
+        self.started = False
+        if self.thread is not None:
+            self.thread.join()
+
+    def report(self):
+        per_frame = self.encode_time / self.recorded * 1000 if self.recorded else 0.0
+        return (f"Recorded {self.recorded} frames to {self.session_dir} "
+                f"({self.dropped} dropped, {per_frame:.1f} ms encode per frame off the main thread)")
+
+
+class ReplayCamera:
+    """
+    Drop-in replacement for Camera that plays back a SessionRecorder session.
+    mode: "realtime" keeps the recorded frame pacing, "fast" returns frames
+    as fast as they are read, "step" holds the current frame until step()
+    is called. A background thread decodes ahead of the reader; if a
+    chunk is missing or corrupt, playback ends there and `error` is set.
+    """
+    def __init__(self, session_dir, mode="realtime", prefetch=32):
+        if mode not in ("realtime", "fast", "step"):
+            raise ValueError(f"Unknown replay mode: {mode}")
+        self.session_dir = session_dir
+        self.mode = mode
+        with open(os.path.join(session_dir, "index.json"), "r") as f:
+            self.index = json.load(f)
+
+        self.frames = queue.Queue(maxsize=prefetch) # (frame, timestamp), None at the end
+        self.frame_index = 0
+        self.last_timestamp = None
+        self.finished = False
+        self.held = None # step mode
+        self.steps = 0
+        self.step_lock = threading.Lock()
+        self.clock = None # (recorded t0, playback t0)
+        self.decoded = 0
+        self.error = None # Set if decoding stopped early
+
+        self.started = False
+        self.thread = None
+
+    def __len__(self):
+        return self.index["frames"]
+
+    def start(self):
+        if self.started:
+            print("Camera already started.")
+            return None
+        self.started = True
+        self.thread = threading.Thread(target=self.update, args=())
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def update(self):
+        # Always end with the None marker, or a failed chunk would leave read() blocked
+        try:
+            self._decode()
+        except Exception as e:
+            self.error = e
+            print(f"Replay stopped at frame {self.decoded} of {len(self)}: {e}")
+        finally:
+            while self.started:
+                try:
+                    self.frames.put(None, timeout=0.5)
+                    break
+                except queue.Full:
+                    pass
+
+    def _decode(self):
+        # Decode ahead; put() blocks once `prefetch` frames are waiting
+        for chunk in self.index["chunks"]:
+            with np.load(os.path.join(self.session_dir, chunk["name"])) as data:
+                payload, offsets, timestamps = data["data"], data["offsets"], data["timestamps"]
+            for i, timestamp in enumerate(timestamps):
+                frame = cv2.imdecode(payload[offsets[i]:offsets[i + 1]], cv2.IMREAD_COLOR)
+                if frame is None:
+                    raise ValueError(f"Corrupt frame {i} in {chunk['name']}")
+                while self.started:
+                    try:
+                        self.frames.put((frame, float(timestamp)), timeout=0.5)
+                        break
+                    except queue.Full:
+                        pass
+                if not self.started:
+                    return
+                self.decoded += 1
+
+    def _next(self):
+        item = self.frames.get()
+        if item is None:
+            self.finished = True
+            return None
+        frame, timestamp = item
+        self.frame_index += 1
+        self.last_timestamp = timestamp
+        return frame
+
+    def step(self, frames=1):
+        """Advance step mode by N frames."""
+        with self.step_lock:
+            self.steps += frames
+
+    def read(self):
+        if not self.started or self.finished:
+            return None
+
+        if self.mode == "step":
+            with self.step_lock:
+                advance = self.held is None or self.steps > 0
+                if advance and self.held is not None:
+                    self.steps -= 1
+            if advance:
+                self.held = self._next()
+            return None if self.held is None else self.held.copy()
+
+        frame = self._next()
+        if frame is None:
+            return None
+        if self.mode == "realtime":
+            now = time.time()
+            if self.clock is None:
+                self.clock = (self.last_timestamp, now)
+            wait = (self.last_timestamp - self.clock[0]) - (now - self.clock[1])
+            if wait > 0:
+                time.sleep(wait)
+        return frame
+
+    def stop(self):
+        self.started = False
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join()
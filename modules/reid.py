@@ -0,0 +1,110 @@
+import time
+import numpy as np
+from collections import OrderedDict
+
+class ReIDCache:
+    """
+    Short-lived memory of verified tracks that the tracker dropped
+    (occlusion, stepping out of frame). A new track that appears close to
+    where a cached one was last seen, within `ttl` seconds, and whose LBP
+    descriptor is not far off, becomes a candidate. The LBP descriptor can't
+    tell people apart, so the candidate is only confirmed by one encode and
+    a 1:1 check against the cached embedding (see resolve()). A confirmed
+    track inherits the verified identity and attributes, skipping the
+    liveness challenge, the 1:N search and the analysis.
+    """
+    def __init__(self, descriptor, ttl=10.0, window_px=200, max_distance=0.35, max_entries=64):
+        self.descriptor = descriptor
+        self.ttl = ttl
+        self.window_px = window_px
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+
+        self.entries = OrderedDict() # track_id -> entry, oldest first
+        self.hits = 0 # Candidates confirmed by the embedding
+        self.misses = 0 # No candidate nearby
+        self.rejected = 0 # Candidate, but a different person
+        self.inferences_saved = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, state, now=None):
+        """
+        Remember a removed track. Only verified tracks with a known
+        position, appearance and embedding are cached.
+        """
+        embedding = state.embedding
+        if not state.verified or state.bbox is None or state.descriptor is None or embedding is None:
+            return
+        norm = np.linalg.norm(embedding)
+        if norm == 0:
+            return
+        now = now or time.time()
+        self.entries[state.track_id] = {
+            "time": now,
+            "bbox": state.bbox,
+            "descriptor": state.descriptor,
+            "template": (embedding / norm).reshape(1, -1), # unit row for FaceRecognizer.verify
+            "name": state.name,
+            "user_id": state.user_id,
+            "conf": state.conf,
+            "attributes": state.attributes,
+        }
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def expire(self, now=None):
+        now = now or time.time()
+        while self.entries:
+            track_id, entry = next(iter(self.entries.items()))
+            if now - entry["time"] <= self.ttl:
+                break
+            del self.entries[track_id]
+
+    def match(self, frame, bbox, now=None):
+        """
+        Returns (entry, descriptor) for the best cached candidate for this
+        face, or (None, descriptor). The entry is consumed; confirm it
+        against the embedding and report the outcome with resolve().
+        """
+        self.expire(now)
+        if not self.entries:
+            return None, None
+
+        cx, cy = (bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2
+        nearby = []
+        for track_id, entry in self.entries.items():
+            ex1, ey1, ex2, ey2 = entry["bbox"]
+            if abs((ex1 + ex2) / 2 - cx) <= self.window_px and abs((ey1 + ey2) / 2 - cy) <= self.window_px:
+                nearby.append(track_id)
+        if not nearby:
+            self.misses += 1
+            return None, None
+
+        descriptor = self.descriptor.compute(frame, bbox)
+        if descriptor is None:
+            self.misses += 1
+            return None, None
+
+        dists = self.descriptor.distances(descriptor, np.stack([self.entries[t]["descriptor"] for t in nearby]))
+        best = int(np.argmin(dists))
+        if dists[best] > self.max_distance:
+            self.misses += 1
+            return None, descriptor
+
+        return self.entries.pop(nearby[best]), descriptor
+
+    def resolve(self, entry, confirmed):
+        """Outcome of the embedding check of a candidate from match()."""
+        if not confirmed:
+            self.rejected += 1
+            return
+        self.hits += 1
+        # Liveness challenge + 1:N search (+ attribute analysis if it had run)
+        self.inferences_saved += 2 + (1 if entry["attributes"] else 0)
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses + self.rejected
+        return self.hits / total if total else 0.0
@@ -0,0 +1,293 @@
+import heapq
+import json
+import multiprocessing as mp
+import os
+import time
+import numpy as np
+
+def _load_shard(shard_dir, index):
+    path = os.path.join(shard_dir, f"shard_{index}")
+    if not os.path.exists(path + ".npy"):
+        return None, [], []
+    # Memory-mapped: the OS page cache holds the rows, not the worker heap
+    matrix = np.load(path + ".npy", mmap_mode="r")
+    with open(path + ".json", "r") as f:
+        meta = json.load(f)
+    return matrix, meta["ids"], meta["names"]
+
+
+def _shard_worker(shard_dir, index, conn):
+    """
+    Worker process holding one shard resident.
+    Messages: ("search", request_id, probe, k), ("reload",), ("stop",)
+    """
+    matrix, ids, names = _load_shard(shard_dir, index)
+    conn.send(("ready", index, len(ids)))
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            break
+
+        if msg[0] == "search":
+            _, request_id, probe, k = msg
+            results = []
+            if matrix is not None and len(ids):
+                dists = 1.0 - matrix @ probe # Cosine distance, rows are unit norm
+                k = min(k, len(ids))
+                top = np.argpartition(dists, k - 1)[:k]
+                results = [(float(dists[i]), ids[i], names[i]) for i in top]
+            conn.send((request_id, index, results))
+        elif msg[0] == "reload":
+            matrix, ids, names = _load_shard(shard_dir, index)
+            conn.send(("reloaded", index, len(ids)))
+        elif msg[0] == "stop":
+            break
+    conn.close()
+
+
+class ShardedGallery:
+    """
+    Gallery partitioned across `num_shards` local worker processes.
+    Each shard is a memory-mapped float32 matrix of unit-norm embeddings;
+    the coordinator only keeps IDs and names, rows live in the shard files.
+    A probe is scattered to every shard and the per-shard top-k lists are
+    merged. A query that misses a shard (slower than `timeout`, or dead)
+    has no answer rather than a partial one; `incomplete` counts such
+    queries in a row so the caller can fall back. Dead or hung workers are
+    respawned from their shard file, at most every `respawn_interval` seconds.
+    Local processes stand in for remote nodes: only the message protocol
+    would change.
+    """
+    def __init__(self, shard_dir, num_shards=2, timeout=0.05, match_threshold=0.4, imbalance=1.5,
+                 start_timeout=60.0, reload_timeout=1.0, respawn_interval=5.0):
+        self.shard_dir = shard_dir
+        self.num_shards = num_shards
+        self.timeout = timeout
+        self.match_threshold = match_threshold
+        self.imbalance = imbalance # Full rebalance when largest/smallest shard exceeds this
+        self.start_timeout = start_timeout # Spawned workers re-run main.py's imports and map their shard first
+        self.reload_timeout = reload_timeout # A worker slower than this to reload is replaced
+        self.respawn_interval = respawn_interval
+
+        self.shards = [] # [(ids, names)] per shard, for placement and rebalancing
+        self.ctx = mp.get_context("spawn")
+        self.workers = []
+        self.conns = [] # None while a shard's worker is dead
+        self.spawned_at = []
+        self.request_id = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.respawns = 0
+        self.complete = False # Whether the last search heard from every shard
+        self.incomplete = 0 # Searches in a row that missed a shard
+
+    def start(self, ids, names, embeddings):
+        os.makedirs(self.shard_dir, exist_ok=True)
+        self.partition(ids, names, embeddings)
+
+        self.workers = [None] * self.num_shards
+        self.conns = [None] * self.num_shards
+        self.spawned_at = [0.0] * self.num_shards
+        for i in range(self.num_shards):
+            self._spawn(i)
+
+        # Don't answer queries before every shard is loaded
+        deadline = time.perf_counter() + self.start_timeout
+        for conn in self.conns:
+            try:
+                if not conn.poll(max(0.0, deadline - time.perf_counter())) or conn.recv()[0] != "ready":
+                    self.failures += 1
+            except (EOFError, OSError):
+                self.failures += 1
+        return self
+
+    def _spawn(self, index):
+        parent, child = self.ctx.Pipe()
+        proc = self.ctx.Process(target=_shard_worker, args=(self.shard_dir, index, child), daemon=True)
+        proc.start()
+        child.close()
+        self.workers[index] = proc
+        self.conns[index] = parent
+        self.spawned_at[index] = time.perf_counter()
+
+    def _kill(self, index):
+        """Drops a dead or hung worker; _respawn() replaces it later."""
+        self.failures += 1
+        conn, proc = self.conns[index], self.workers[index]
+        self.conns[index] = None
+        if conn is not None:
+            conn.close()
+        if proc is not None and proc.is_alive():
+            proc.kill() # SIGKILL: a hung (or stopped) process may never handle SIGTERM
+
+    def _respawn(self):
+        # The new worker maps the current shard file; its "ready" is dropped
+        # by search() like any stale reply, so this doesn't block the caller
+        now = time.perf_counter()
+        for i, conn in enumerate(self.conns):
+            if conn is None and now - self.spawned_at[i] >= self.respawn_interval:
+                if self.workers[i] is not None:
+                    self.workers[i].join(timeout=0.1)
+                self._spawn(i)
+                self.respawns += 1
+
+    def partition(self, ids, names, embeddings):
+        """Round-robin split of the gallery into shards; writes every shard file."""
+        self.shards = [([], []) for _ in range(self.num_shards)]
+        rows = [[] for _ in range(self.num_shards)]
+        for i, (uid, name, emb) in enumerate(zip(ids, names, embeddings)):
+            shard = self.shards[i % self.num_shards]
+            shard[0].append(uid)
+            shard[1].append(name)
+            rows[i % self.num_shards].append(self._normalize(emb))
+        for i in range(self.num_shards):
+            self._write_shard(i, np.stack(rows[i]) if rows[i] else None)
+
+    @staticmethod
+    def _normalize(embedding):
+        v = np.asarray(embedding, dtype=np.float32).ravel()
+        n = np.linalg.norm(v)
+        return v / n if n > 0 else v
+
+    def _read_rows(self, index):
+        matrix, _, _ = _load_shard(self.shard_dir, index)
+        return None if matrix is None else np.array(matrix) # Copy out of the map before replacing the file
+
+    def _write_shard(self, index, matrix):
+        ids, names = self.shards[index]
+        path = os.path.join(self.shard_dir, f"shard_{index}")
+        if matrix is not None and len(matrix):
+            # Write then rename, so a worker never maps a half-written file
+            np.save(path + ".tmp.npy", matrix)
+            os.replace(path + ".tmp.npy", path + ".npy")
+        elif os.path.exists(path + ".npy"):
+            os.remove(path + ".npy")
+        with open(path + ".json.tmp", "w") as f:
+            json.dump({"ids": ids, "names": names}, f)
+        os.replace(path + ".json.tmp", path + ".json")
+
+    def _reload(self, indices):
+        for i in indices:
+            conn = self.conns[i]
+            if conn is None:
+                continue # Respawned from the new file anyway
+            deadline = time.perf_counter() + self.reload_timeout
+            try:
+                conn.send(("reload",))
+                # Drain stale search replies until the reload is acknowledged
+                while True:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0 or not conn.poll(remaining):
+                        raise TimeoutError
+                    if conn.recv()[0] == "reloaded":
+                        break
+            except (TimeoutError, EOFError, OSError):
+                # Hung or dead: a fresh worker maps the new file
+                self._kill(i)
+
+    def add_user(self, user_id, name, embedding):
+        """
+        Adds a user to the smallest shard; repartitions everything (reading
+        the rows back from the shard files) if the shards drift too far
+        apart in size.
+        """
+        sizes = [len(s[0]) for s in self.shards]
+        index = int(np.argmin(sizes))
+        row = self._normalize(embedding)[None, :]
+
+        sizes[index] += 1
+        if min(sizes) > 0 and max(sizes) / min(sizes) > self.imbalance:
+            all_ids = [u for s in self.shards for u in s[0]] + [user_id]
+            all_names = [n for s in self.shards for n in s[1]] + [name]
+            matrices = [m for m in (self._read_rows(i) for i in range(self.num_shards)) if m is not None]
+            all_rows = np.concatenate(matrices + [row])
+            self.partition(all_ids, all_names, all_rows)
+            changed = list(range(self.num_shards))
+        else:
+            ids, names = self.shards[index]
+            ids.append(user_id)
+            names.append(name)
+            current = self._read_rows(index)
+            self._write_shard(index, row if current is None else np.concatenate([current, row]))
+            changed = [index]
+
+        self._reload(changed)
+
+    def search(self, embedding, k=5):
+        """
+        Returns the merged top-k as [(distance, user_id, name), ...];
+        `complete` tells whether every shard answered.
+        """
+        self._respawn()
+        self.request_id += 1
+        request_id = self.request_id
+        probe = self._normalize(embedding)
+        failed = False
+        for i, conn in enumerate(self.conns):
+            try:
+                if conn is None:
+                    failed = True # Waiting to be respawned
+                    continue
+                conn.send(("search", request_id, probe, k))
+            except OSError: # Includes BrokenPipeError
+                self._kill(i)
+                failed = True
+
+        deadline = time.perf_counter() + self.timeout
+        pending = {i for i, conn in enumerate(self.conns) if conn is not None}
+        results = []
+        while pending:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            for i in list(pending):
+                try:
+                    if not self.conns[i].poll(remaining / len(pending)):
+                        continue
+                    reply_id, index, shard_results = self.conns[i].recv()
+                except (EOFError, OSError):
+                    # Worker died: respawned on a later search
+                    pending.discard(i)
+                    self._kill(i)
+                    failed = True
+                    continue
+                if reply_id == request_id: # Late replies to older queries (and "ready") are dropped
+                    results.extend(shard_results)
+                    pending.discard(i)
+        self.timeouts += len(pending)
+        self.complete = not pending and not failed
+        self.incomplete = 0 if self.complete else self.incomplete + 1
+        return heapq.nsmallest(k, results)
+
+    def identify(self, embedding):
+        """
+        Same return shape as FaceRecognizer.identify: (user_id, name, distance, confidence),
+        or None when a shard did not answer, so the caller retries instead of
+        deciding on part of the gallery.
+        """
+        if embedding is None:
+            return None, "Unknown", 1.0, 0.0
+        top = self.search(embedding, k=1)
+        if not self.complete:
+            return None
+        if top and top[0][0] < self.match_threshold:
+            dist, uid, name = top[0]
+            return uid, name, dist, max(0.0, 1.0 - dist)
+        return None, "Unknown", top[0][0] if top else 1.0, 0.0
+
+    def stop(self):
+        for conn in self.conns:
+            try:
+                if conn is not None:
+                    conn.send(("stop",))
+            except OSError:
+                pass
+        for proc in self.workers:
+            if proc is None:
+                continue
+            proc.join(timeout=1.0)
+            if proc.is_alive():
+                proc.terminate()
+        self.workers = []
+        self.conns = []
@@ -0,0 +1,192 @@
+import cv2
+import numpy as np
+import os
+import threading
+import time
+
+class SyntheticCamera:
+    """
+    Drop-in replacement for Camera that renders a synthetic crowd.
+    Frames are generated on read(), so a given seed always produces the
+    same frame sequence regardless of how fast the consumer runs.
+    """
+    def __init__(self, num_faces=10, width=1280, height=720, faces_dir=None,
+                 face_size=(80, 160), speed=4.0, occlusion=0.0, lighting=0.0,
+                 fps=None, seed=0):
+        self.width = width
+        self.height = height
+        self.num_faces = num_faces
+        self.face_size = face_size
+        self.speed = speed
+        self.occlusion = occlusion # Fraction of faces partially covered
+        self.lighting = lighting # Amplitude of brightness variation (0-1)
+        self.fps = fps # None = as fast as possible
+        self.rng = np.random.default_rng(seed)
+
+        self.started = False
+        self.read_lock = threading.Lock()
+        self.frame_index = 0
+        self.last_read = 0.0
+        self.last_timestamp = None
+        self.finished = False
+
+        self.background = self._make_background()
+        self.patches = self._load_patches(faces_dir) if faces_dir else []
+        if not self.patches:
+            self.patches = [self._make_face(i) for i in range(8)]
+
+        self.faces = [self._spawn() for _ in range(num_faces)]
+
+    def _make_background(self):
+        noise = self.rng.integers(60, 140, (self.height // 16 + 1, self.width // 16 + 1, 3), dtype=np.uint8)
+        bg = cv2.resize(noise, (self.width, self.height), interpolation=cv2.INTER_CUBIC)
+        return cv2.GaussianBlur(bg, (0, 0), 5)
+
+    def _load_patches(self, faces_dir):
+        patches = []
+        for name in sorted(os.listdir(faces_dir)):
+            if not name.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
+                continue
+            img = cv2.imread(os.path.join(faces_dir, name))
+            if img is not None:
+                patches.append(cv2.resize(img, (128, 128)))
+        return patches
+
+    def _make_face(self, i):
+        """
+        Procedural face: skin ellipse with darker eyes, brows and mouth.
+        Crude, but gives the Haar cascade the light/dark pattern it looks for.
+        """
+        size = 128
+        skin = np.array([120, 160, 210]) * (0.75 + 0.05 * i)
+        skin = tuple(int(c) for c in np.clip(skin, 0, 255))
+        img = np.full((size, size, 3), 90, dtype=np.uint8)
+        cv2.ellipse(img, (64, 64), (50, 62), 0, 0, 360, skin, -1)
+
+        dark = tuple(int(c * 0.35) for c in skin)
+        for ex in (42, 86):
+            cv2.ellipse(img, (ex, 36), (14, 4), 0, 0, 360, dark, -1) # Brow
+            cv2.ellipse(img, (ex, 50), (10, 6), 0, 0, 360, dark, -1) # Eye
+        cv2.line(img, (64, 52), (60, 78), tuple(int(c * 0.7) for c in skin), 3) # Nose
+        cv2.ellipse(img, (64, 95), (20, 6), 0, 0, 360, dark, -1) # Mouth
+        return cv2.GaussianBlur(img, (5, 5), 0)
+
+    def _spawn(self):
+        size = int(self.rng.integers(self.face_size[0], self.face_size[1] + 1))
+        patch = self.patches[int(self.rng.integers(len(self.patches)))]
+        patch = cv2.resize(patch, (size, size))
+        mask = np.zeros((size, size), dtype=np.uint8)
+        cv2.ellipse(mask, (size // 2, size // 2), (size * 2 // 5, size // 2), 0, 0, 360, 255, -1)
+
+        angle = self.rng.uniform(0, 2 * np.pi)
+        return {
+            "patch": patch,
+            "mask": mask > 0,
+            "size": size,
+            "pos": np.array([self.rng.uniform(0, self.width - size), self.rng.uniform(0, self.height - size)]),
+            "vel": np.array([np.cos(angle), np.sin(angle)]) * self.speed,
+            "gain": self.rng.uniform(1 - self.lighting, 1 + self.lighting) if self.lighting else 1.0,
+            "occluded": self.rng.random() < self.occlusion
+        }
+
+    def _step(self):
+        for face in self.faces:
+            face["pos"] += face["vel"]
+            limit = np.array([self.width, self.height]) - face["size"]
+            for axis in (0, 1):
+                if face["pos"][axis] < 0 or face["pos"][axis] > limit[axis]:
+                    face["vel"][axis] *= -1
+                    face["pos"][axis] = np.clip(face["pos"][axis], 0, limit[axis])
+
+    def render(self):
+        frame = self.background.copy()
+        for face in self.faces:
+            x, y = int(face["pos"][0]), int(face["pos"][1])
+            s = face["size"]
+            patch = face["patch"]
+            if face["gain"] != 1.0:
+                patch = cv2.convertScaleAbs(patch, alpha=face["gain"])
+            roi = frame[y:y + s, x:x + s]
+            roi[face["mask"]] = patch[face["mask"]]
+
+            if face["occluded"]:
+                # A bar sweeping over the lower part of the face
+                oy = y + s // 2 + int((s // 3) * np.sin(self.frame_index * 0.1))
+                cv2.rectangle(frame, (x, oy), (x + s, oy + s // 3), (40, 40, 40), -1)
+
+        if self.lighting:
+            # Slow global flicker, e.g. clouds or a fluorescent tube
+            gain = 1.0 + self.lighting * 0.5 * np.sin(self.frame_index * 0.05)
+            frame = cv2.convertScaleAbs(frame, alpha=gain)
+        return frame
+
+    def ground_truth(self):
+        """Current face boxes as (x1, y1, x2, y2)."""
+        boxes = []
+        for face in self.faces:
+            x, y = int(face["pos"][0]), int(face["pos"][1])
+            boxes.append((x, y, x + face["size"], y + face["size"]))
+        return boxes
+
+    def start(self):
+        if self.started:
+            print("Camera already started.")
+            return None
+        self.started = True
+        return self
+
+    def update(self):
+        # Frames are produced on demand in read(); kept for interface parity with Camera
+        pass
+
+    def read(self):
+        with self.read_lock:
+            if not self.started:
+                return None
+            if self.fps:
+                # Pace to the requested frame rate
+                wait = (1.0 / self.fps) - (time.time() - self.last_read)
+                if wait > 0:
+                    time.sleep(wait)
+                self.last_read = time.time()
+            self.last_timestamp = time.time()
+            frame = self.render()
+            self._step()
+            self.frame_index += 1
+            return frame
+
+    def stop(self):
+        self.started = False
+
+
+def render_head(patch, pitch, yaw, size=160, hair=(40, 45, 50)):
+    """
+    A 128x128 face patch wrapped onto the front of an ellipsoid head,
+    turned by yaw (> 0: face turns to the image left) and pitch (> 0: face
+    tilts down), in degrees, seen by an orthographic camera.
+    Returns (image, mask): size x size BGR render and where the head is.
+    Used to calibrate the pose proxy against known angles (benchmark.py pose).
+    """
+    a, b = 1.0, 1.24 # Head half-width and half-height, in units of the 50 px face ellipse radius
+    p, y = np.radians(-pitch), np.radians(-yaw)
+    ry = np.array([[np.cos(y), 0, np.sin(y)], [0, 1, 0], [-np.sin(y), 0, np.cos(y)]])
+    rx = np.array([[1, 0, 0], [0, np.cos(p), -np.sin(p)], [0, np.sin(p), np.cos(p)]])
+    rot = ry @ rx
+    quad = rot @ np.diag([1 / a ** 2, 1 / b ** 2, 1.0]) @ rot.T
+
+    # Ray along -z through every pixel: nearest intersection with the ellipsoid
+    xs, ys = np.meshgrid(np.linspace(-1.4, 1.4, size), np.linspace(-1.4, 1.4, size))
+    qa = quad[2, 2]
+    qb = 2 * (quad[2, 0] * xs + quad[2, 1] * ys)
+    qc = quad[0, 0] * xs ** 2 + quad[1, 1] * ys ** 2 + 2 * quad[0, 1] * xs * ys - 1
+    disc = qb ** 2 - 4 * qa * qc
+    t = (-qb + np.sqrt(np.maximum(disc, 0))) / (2 * qa)
+    head = np.stack([xs, ys, t], axis=-1) @ rot # Back into head coordinates
+
+    # The patch face ellipse is centred at (64, 64) with a 50 px half-width
+    map_x = (64 + 50 * head[..., 0]).astype(np.float32)
+    map_y = (64 + 50 * head[..., 1]).astype(np.float32)
+    img = cv2.remap(patch, map_x, map_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+    mask = disc >= 0
+    img[mask & (head[..., 2] < 0.05)] = hair # Sides and back of the head
+    return img, mask
@@ -0,0 +1,133 @@
+import json
+import time
+import numpy as np
+from collections import deque
+
+# Markers a track passes through on the way to an identity decision
+MARKERS = [
+    "first_detection", "first_quality_pass", "challenge_start",
+    "challenge_pass", "encode_start", "encode_end", "decision"
+]
+
+# (phase, from marker, to marker)
+PHASES = [
+    ("quality", "first_detection", "first_quality_pass"),
+    ("liveness", "first_quality_pass", "challenge_pass"),
+    ("challenge", "challenge_start", "challenge_pass"),
+    ("queue", "challenge_pass", "encode_start"),
+    ("encode", "encode_start", "encode_end"),
+    ("identify", "encode_end", "decision"),
+]
+
+class AuthTracer:
+    """
+    Per-track authentication latency tracing.
+    Each track collects timestamped markers; when it reaches a decision the
+    trace is closed and kept (up to `max_traces`) for time-to-authenticate
+    percentiles, a per-phase breakdown and Chrome trace export
+    (open the JSON in chrome://tracing or Perfetto).
+    """
+    def __init__(self, max_traces=1000):
+        self.active = {} # track_id -> {"markers": {}, "tags": {}}
+        self.completed = deque(maxlen=max_traces)
+        self.abandoned = 0
+
+    def event(self, track_id, marker, ts=None, overwrite=False):
+        """
+        Record a marker for a track. Only the first occurrence is kept
+        unless overwrite is set.
+        """
+        trace = self.active.get(track_id)
+        if trace is None:
+            trace = self.active[track_id] = {"markers": {}, "tags": {}}
+        if overwrite or marker not in trace["markers"]:
+            trace["markers"][marker] = ts if ts is not None else time.time()
+
+    def tag(self, track_id, **tags):
+        trace = self.active.get(track_id)
+        if trace is not None:
+            trace["tags"].update(tags)
+
+    def finish(self, track_id, outcome, ts=None):
+        """Close a track's trace with its decision (e.g. ALLOW / DENY)."""
+        self.event(track_id, "decision", ts)
+        trace = self.active.pop(track_id)
+        trace["track_id"] = track_id
+        trace["outcome"] = outcome
+        self.completed.append(trace)
+
+    def discard(self, track_id, abandoned=True):
+        """
+        Drop a track's open trace: lost before a decision, or (abandoned=False)
+        not a fresh authentication, e.g. an identity carried over by re-ID.
+        """
+        if self.active.pop(track_id, None) is not None and abandoned:
+            self.abandoned += 1
+
+    @staticmethod
+    def total(trace):
+        m = trace["markers"]
+        return m["decision"] - m["first_detection"] if "first_detection" in m else None
+
+    @staticmethod
+    def phases(trace):
+        m = trace["markers"]
+        return {name: m[b] - m[a] for name, a, b in PHASES if a in m and b in m}
+
+    def summary(self, outcome=None, **tags):
+        """
+        Time-to-authenticate percentiles and median per phase (seconds) over
+        completed traces, optionally filtered by outcome and tags.
+        """
+        traces = [
+            t for t in self.completed
+            if (outcome is None or t["outcome"] == outcome)
+            and all(t["tags"].get(k) == v for k, v in tags.items())
+        ]
+        totals = np.array([x for x in (self.total(t) for t in traces) if x is not None])
+        result = {"count": len(traces)}
+        if len(totals):
+            result["p50"], result["p90"], result["p99"] = np.percentile(totals, [50, 90, 99])
+        for name, _, _ in PHASES:
+            values = [p[name] for p in (self.phases(t) for t in traces) if name in p]
+            if values:
+                result[name] = float(np.median(values))
+        return result
+
+    def report(self):
+        lines = []
+        for method in ("passive", "active"):
+            s = self.summary(outcome="ALLOW", liveness=method)
+            if s["count"] == 0 or "p50" not in s:
+                continue
+            phases = ", ".join(f"{name} {s[name]:.2f}" for name, _, _ in PHASES if name in s)
+            lines.append(
+                f"Time to authenticate ({method} liveness, n={s['count']}): "
+                f"p50 {s['p50']:.2f}s p90 {s['p90']:.2f}s p99 {s['p99']:.2f}s | median phases: {phases}"
+            )
+        return lines
+
+    def export_chrome_trace(self, path):
+        """
+        Writes completed traces in Chrome trace event format:
+        one row (tid) per track, a complete event per phase and an instant
+        event per marker.
+        """
+        events = []
+        for trace in self.completed:
+            tid = trace["track_id"]
+            m = trace["markers"]
+            args = dict(trace["tags"], outcome=trace["outcome"])
+            for name, a, b in PHASES:
+                if a in m and b in m:
+                    events.append({
+                        "name": name, "ph": "X", "pid": 1, "tid": tid,
+                        "ts": m[a] * 1e6, "dur": (m[b] - m[a]) * 1e6, "args": args
+                    })
+            for marker, ts in m.items():
+                events.append({"name": marker, "ph": "i", "s": "t", "pid": 1, "tid": tid, "ts": ts * 1e6})
+            events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid,
+                           "args": {"name": f"track {tid}"}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+        return len(events)
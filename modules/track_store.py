@@ -0,0 +1,156 @@
+import time
+import numpy as np
+
+class TrackState:
+    """
+    Per-track authentication state. __slots__ keeps each record small and
+    avoids a per-instance dict; the embedding lives in the store's pool.
+    """
+    __slots__ = (
+        'track_id', 'slot', 'last_seen', 'name', 'user_id', 'conf', 'verified',
+        'liveness_status', 'challenge', 'liveness_obj', 'quality_ok', 'identified',
+        'attributes', 'welcome_printed', 'timeout_logged', 'bbox', 'descriptor',
+        'created_at', 'liveness_method', 'lbp_rejects', 'reid_entry', 'store'
+    )
+
+    def __init__(self, store, track_id, slot, frame_index):
+        self.store = store
+        self.track_id = track_id
+        self.slot = slot
+        self.reset(frame_index)
+
+    def reset(self, frame_index):
+        self.last_seen = frame_index
+        self.name = "Unknown"
+        self.user_id = None
+        self.conf = 0.0
+        self.verified = False
+        self.liveness_status = "PENDING"
+        self.challenge = None
+        self.liveness_obj = None
+        self.quality_ok = False
+        self.identified = False
+        self.attributes = {}
+        self.welcome_printed = False
+        self.timeout_logged = False
+        self.bbox = None # Last seen box
+        self.descriptor = None # LBP appearance descriptor
+        self.created_at = time.time()
+        self.liveness_method = None # "passive" / "active" once liveness passed
+        self.lbp_rejects = 0 # Consecutive cascade rejects without deep inference
+        self.reid_entry = None # Re-ID candidate waiting for its embedding check
+
+    @property
+    def embedding(self):
+        """View into the store's float32 pool, or None."""
+        return self.store.get_embedding(self.slot)
+
+    @embedding.setter
+    def embedding(self, value):
+        self.store.set_embedding(self, value)
+
+
+class TrackStateStore:
+    """
+    Fixed-capacity store of TrackState records.
+    Embeddings are kept in one preallocated float32 matrix, one row per
+    slot, so memory is bounded by `max_memory_mb` no matter how busy the
+    scene is. Records are only touched when tracks are created or removed,
+    never rebuilt per frame.
+    When full, the least recently seen unverified track is evicted
+    (verified tracks only if every slot is verified).
+    """
+    def __init__(self, capacity=256, embedding_dim=4096, max_memory_mb=64):
+        self.max_memory_mb = max_memory_mb
+        self.max_tracks = capacity
+        self._allocate(embedding_dim)
+
+        self.records = {}
+        self.free_slots = list(range(self.capacity - 1, -1, -1))
+        self.evicted = 0
+
+    def _allocate(self, embedding_dim):
+        # Capacity is capped so the embedding pool fits the memory ceiling
+        row_bytes = embedding_dim * np.dtype(np.float32).itemsize
+        max_rows = max(1, int(self.max_memory_mb * 1024 * 1024 // row_bytes))
+        self.capacity = min(self.max_tracks, max_rows)
+        self.embedding_dim = embedding_dim
+        self.embeddings = np.zeros((self.capacity, embedding_dim), dtype=np.float32)
+        self.has_embedding = np.zeros(self.capacity, dtype=bool)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, track_id):
+        return track_id in self.records
+
+    def get(self, track_id):
+        return self.records.get(track_id)
+
+    def create(self, track_id, frame_index=0):
+        if not self.free_slots:
+            self._evict()
+        slot = self.free_slots.pop()
+        self.has_embedding[slot] = False
+        state = TrackState(self, track_id, slot, frame_index)
+        self.records[track_id] = state
+        return state
+
+    def get_or_create(self, track_id, frame_index=0):
+        """Returns (state, created)."""
+        state = self.records.get(track_id)
+        if state is not None:
+            state.last_seen = frame_index
+            return state, False
+        return self.create(track_id, frame_index), True
+
+    def remove(self, track_id):
+        state = self.records.pop(track_id, None)
+        if state is None:
+            return None
+        if state.slot < self.capacity:
+            self.has_embedding[state.slot] = False
+            self.free_slots.append(state.slot)
+        state.liveness_obj = None
+        return state
+
+    def _evict(self):
+        candidates = [s for s in self.records.values() if not s.verified] or list(self.records.values())
+        oldest = min(candidates, key=lambda s: s.last_seen)
+        self.remove(oldest.track_id)
+        self.evicted += 1
+
+    def get_embedding(self, slot):
+        if not self.has_embedding[slot]:
+            return None
+        return self.embeddings[slot]
+
+    def set_embedding(self, state, value):
+        if value is None:
+            self.has_embedding[state.slot] = False
+            return
+        value = np.asarray(value, dtype=np.float32).ravel()
+        if value.shape[0] != self.embedding_dim:
+            # Model changed: reallocate the pool (track embeddings are transient)
+            self._reallocate(value.shape[0])
+            if state.track_id not in self.records:
+                return # Evicted while shrinking
+        self.embeddings[state.slot] = value
+        self.has_embedding[state.slot] = True
+
+    def _reallocate(self, embedding_dim):
+        old_capacity = self.capacity
+        self._allocate(embedding_dim)
+        if self.capacity < old_capacity:
+            # Fewer slots fit: evict until every record has a valid slot
+            while len(self.records) > self.capacity:
+                self._evict()
+        used = {s.slot for s in self.records.values() if s.slot < self.capacity}
+        for state in self.records.values():
+            if state.slot >= self.capacity:
+                state.slot = next(i for i in range(self.capacity) if i not in used)
+                used.add(state.slot)
+        self.free_slots = [i for i in range(self.capacity - 1, -1, -1) if i not in used]
+
+    def memory_bytes(self):
+        return self.embeddings.nbytes + self.has_embedding.nbytes
@@ -7,6 +7,7 @@ class CentroidTracker:
         self.objects = OrderedDict()
         self.disappeared = OrderedDict()
         self.max_disappeared = max_disappeared
+        self.deregistered = [] # IDs removed since the last pop_deregistered()
 
     def register(self, centroid):
         self.objects[self.next_object_id] = centroid
@@ -16,6 +17,13 @@ class CentroidTracker:
     def deregister(self, object_id):
         del self.objects[object_id]
         del self.disappeared[object_id]
+        self.deregistered.append(object_id)
+
+    def pop_deregistered(self):
+        """Returns and clears the IDs removed since the last call."""
+        removed = self.deregistered
+        self.deregistered = []
+        return removed
 
     def update(self, rects):
         if len(rects) == 0: